@@ -0,0 +1 @@
+# Engine benchmarks
@@ -0,0 +1,355 @@
+# bench_engine.py
+# End to end engine benchmarks. Drives Game.start against the mock backend or a local fake Ollama server
+# and reports throughput, per-phase wall time, prompt-build time, parse time and peak memory.
+#
+# Usage:
+#   python -m benchmarks.bench_engine                        # mock backend, 15/50/150 players
+#   python -m benchmarks.bench_engine --backend http         # fake Ollama over HTTP
+#   python -m benchmarks.bench_engine --backend http --token-latency 0.003 --ramble 60 --stream
+#                                                             # stop streamed vote/night calls at the closing tag,
+#                                                             # only calls without a stop sequence are streamed
+#   python -m benchmarks.bench_engine --backend http --stall-rate 0.02 --call-timeout 0.5
+#                                                             # hung calls fall back after their deadline
+#   python -m benchmarks.bench_engine --backend http --hosts 3 --parallel 2 --latency 0.05 --concurrency 12
+#                                                             # balance the calls over three fake servers
+#   python -m benchmarks.bench_engine --check                # fail on regressions against the baseline
+#   python -m benchmarks.bench_engine --update-baseline      # record a new baseline
+#
+# Timings only compare on the same machine, so --check only gates them against a baseline recorded on the machine
+# that runs it: record one with --update-baseline first, e.g. on the base commit in the same CI job. Against a
+# baseline from anywhere else, the committed one included, only peak memory is checked.
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from game.backends import BalancedBackend, CachingBackend, LLMBackend, LLMRequest, LLMResult, MockBackend, OllamaBackend, ResponseCache
+from game.debug_capture import debug_capture
+from game.engine import Game
+from game.metrics import MetricsRecorder
+from game.parser import Parser
+from game.phase import Phase
+from game.player import Player
+from game.roles.base import Role
+from game.roles.doctor import Doctor
+from game.roles.godfather import Godfather
+from game.roles.innocent import Innocent
+from game.roles.mafioso import Mafioso
+from game.roles.sheriff import Sheriff
+from benchmarks.fake_ollama import FakeOllamaServer
+
+BASELINE_PATH: str = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics compared against the baseline and whether a higher value is better
+TRACKED_METRICS: dict[str, bool] = {
+    "games_per_sec": True,
+    "engine_us_per_call": False,
+    "peak_memory_mb": False,
+}
+# Tracked metrics that depend on the speed of the machine
+TIMED_METRICS: set[str] = {"games_per_sec", "engine_us_per_call"}
+
+# Start time of the prompt currently being built, per task
+_prompt_started: contextvars.ContextVar[float | None] = contextvars.ContextVar("prompt_started", default=None)
+
+
+class BenchStats:
+    def __init__(self):
+        self.phase_seconds: dict[str, float] = {"day": 0.0, "vote": 0.0, "night": 0.0}
+        self.prompt_build_seconds: float = 0.0
+        self.parse_seconds: float = 0.0
+        # Wall time with at least one LLM call in flight, calls overlap when phases run concurrently
+        self.llm_seconds: float = 0.0
+        self.in_flight: int = 0
+        self.busy_since: float = 0.0
+        self.calls: int = 0
+        self.days: int = 0
+
+
+STATS: BenchStats = BenchStats()
+
+
+class TimingBackend(LLMBackend):
+    """Wraps a backend to measure prompt-build time (time since the player started its turn) and call time."""
+
+    def __init__(self, inner: LLMBackend):
+        self.inner: LLMBackend = inner
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        now: float = time.perf_counter()
+        started: float | None = _prompt_started.get()
+        if started is not None:
+            STATS.prompt_build_seconds += now - started
+        STATS.calls += 1
+        if STATS.in_flight == 0:
+            STATS.busy_since = now
+        STATS.in_flight += 1
+        try:
+            return await self.inner.chat(request)
+        finally:
+            STATS.in_flight -= 1
+            if STATS.in_flight == 0:
+                STATS.llm_seconds += time.perf_counter() - STATS.busy_since
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        # Counted as LLM time so the model load doesn't show up as engine overhead
+        started: float = time.perf_counter()
+        try:
+            return await self.inner.preload(model, keep_alive, num_ctx)
+        finally:
+            STATS.llm_seconds += time.perf_counter() - started
+
+
+class TimedGame(Game):
+    """Game with per-phase wall clock timing."""
+
+    async def day_phase(self) -> None:
+        started: float = time.perf_counter()
+        await super().day_phase()
+        STATS.phase_seconds["day"] += time.perf_counter() - started
+        STATS.days += 1
+
+    async def voting_phase(self) -> None:
+        started: float = time.perf_counter()
+        await super().voting_phase()
+        STATS.phase_seconds["vote"] += time.perf_counter() - started
+
+    async def night_phase(self) -> None:
+        started: float = time.perf_counter()
+        await super().night_phase()
+        STATS.phase_seconds["night"] += time.perf_counter() - started
+
+
+def instrument() -> None:
+    """Patch the prompt builders and the parser to feed STATS."""
+    def mark_prompt_start(method):
+        async def wrapper(self, *args, **kwargs):
+            _prompt_started.set(time.perf_counter())
+            return await method(self, *args, **kwargs)
+        return wrapper
+
+    for name in ("chat", "vote", "night"):
+        setattr(Player, name, mark_prompt_start(getattr(Player, name)))
+
+    parse = Parser.parse
+
+    def timed_parse(self, *args, **kwargs):
+        started: float = time.perf_counter()
+        try:
+            return parse(self, *args, **kwargs)
+        finally:
+            STATS.parse_seconds += time.perf_counter() - started
+
+    Parser.parse = timed_parse
+
+
+def make_roles(player_count: int) -> list[Role]:
+    """The main.py setup scaled up: Godfather, Mafioso, Sheriff, Doctor and Innocents for the rest."""
+    roles: list[Role] = [Godfather(), Mafioso(), Sheriff(), Doctor()]
+    roles += [Innocent() for _ in range(player_count - len(roles))]
+    return roles
+
+
+async def play(player_count: int, backend: LLMBackend, seed: int, settings: dict) -> Game:
+    game: Game = TimedGame(player_count=player_count, roles=make_roles(player_count), history_sinks=[],
+                           backend=TimingBackend(backend), metrics=MetricsRecorder(), seed=seed)
+    for name, value in settings.items():
+        setattr(game, name, value)
+    await game.start()
+    return game
+
+
+async def bench_size(player_count: int, games: int | None, make_backend, seed: int, settings: dict) -> dict:
+    global STATS
+    games = games or max(1, 150 // player_count)
+
+    # One unmeasured game to warm up imports and caches
+    await play(player_count, make_backend(-1), seed - 1, settings)
+    STATS = BenchStats()
+
+    timeouts: int = 0
+    hedges: int = 0
+    started: float = time.perf_counter()
+    for i in range(games):
+        game: Game = await play(player_count, make_backend(i), seed + i, settings)
+        timeouts += game.metrics.counters.get("llm_timeouts", 0)
+        hedges += game.metrics.counters.get("llm_hedged_calls", 0)
+    wall: float = time.perf_counter() - started
+    stats: BenchStats = STATS
+
+    # Peak memory is measured on a separate game, tracemalloc slows everything down
+    STATS = BenchStats()
+    tracemalloc.start()
+    await play(player_count, make_backend(games), seed + games, settings)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "players": player_count,
+        "games": games,
+        "games_per_sec": games / wall,
+        "days_per_game": stats.days / games,
+        "calls_per_game": stats.calls / games,
+        "engine_us_per_call": (wall - stats.llm_seconds) / max(1, stats.calls) * 1e6,
+        "phase_ms_per_game": {phase: seconds / games * 1000 for phase, seconds in stats.phase_seconds.items()},
+        "prompt_build_ms_per_game": stats.prompt_build_seconds / games * 1000,
+        "parse_ms_per_game": stats.parse_seconds / games * 1000,
+        "llm_ms_per_game": stats.llm_seconds / games * 1000,
+        "peak_memory_mb": peak / 1024 / 1024,
+        "timeouts_per_game": timeouts / games,
+        "hedges_per_game": hedges / games,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    servers: list[FakeOllamaServer] = []
+    if args.backend == "http":
+        for i in range(args.hosts):
+            server = FakeOllamaServer(latency=args.latency, token_latency=args.token_latency, seed=args.seed + i,
+                                      ramble=args.ramble, load_latency=args.load_latency, stall_rate=args.stall_rate,
+                                      parallel=args.parallel)
+            await server.start()
+            servers.append(server)
+        if len(servers) == 1:
+            make_backend = lambda i: OllamaBackend(host=servers[0].url, stream=args.stream)
+        else:
+            # One balancer for every game, its per-host caps only hold if the games share it
+            balancer: BalancedBackend = BalancedBackend([OllamaBackend(host=server.url, stream=args.stream) for server in servers],
+                                                        max_in_flight=args.max_in_flight or args.parallel or 4, hedge=args.hedge)
+            make_backend = lambda i: balancer
+    else:
+        make_backend = lambda i: MockBackend(seed=args.seed + i, latency=args.latency)
+
+    if args.cache:
+        # Identical prompts are answered from disk instead of the backend
+        cache: ResponseCache = ResponseCache(args.cache)
+        make_uncached = make_backend
+        make_backend = lambda i: CachingBackend(make_uncached(i), cache)
+
+    settings: dict = {}
+    if args.call_timeout is not None:
+        settings["call_timeouts"] = {phase: args.call_timeout for phase in (Phase.DAY, Phase.VOTE, Phase.NIGHT)}
+    if args.concurrency is not None:
+        settings["max_concurrent_calls"] = args.concurrency
+
+    results: dict[str, dict] = {}
+    try:
+        for player_count in args.players:
+            result: dict = await bench_size(player_count, args.games, make_backend, args.seed, settings)
+            results[str(player_count)] = result
+            print_result(result)
+    finally:
+        for server in servers:
+            await server.stop()
+    return results
+
+
+def print_result(result: dict) -> None:
+    phases: str = " ".join(f"{phase}={ms:.1f}ms" for phase, ms in result["phase_ms_per_game"].items())
+    print(
+        f"{result['players']:>4} players: {result['games_per_sec']:8.2f} games/s "
+        f"{result['engine_us_per_call']:8.1f} us/call  {phases}  "
+        f"prompt={result['prompt_build_ms_per_game']:.1f}ms parse={result['parse_ms_per_game']:.1f}ms "
+        f"peak={result['peak_memory_mb']:.2f}MB ({result['days_per_game']:.1f} days, {result['calls_per_game']:.0f} calls/game)"
+        + (f" {result['timeouts_per_game']:.1f} timeouts/game" if result["timeouts_per_game"] else "")
+        + (f" {result['hedges_per_game']:.1f} hedges/game" if result["hedges_per_game"] else "")
+    )
+
+
+def machine_id() -> str:
+    """Where timings were taken, they only compare between runs on the same machine and Python."""
+    return f"{platform.node()} {platform.machine()} Python {platform.python_version()}"
+
+
+def check_regressions(results: dict[str, dict], baseline: dict, backend: str) -> list[str]:
+    """
+    Compare results against the baseline, returning a message per regression beyond the threshold.
+    Timings are skipped unless the baseline was recorded on this machine.
+    """
+    thresholds: dict[str, float] = baseline.get("thresholds", {})
+    same_machine: bool = baseline.get("machine") == machine_id()
+    failures: list[str] = []
+    for size, result in results.items():
+        reference: dict | None = baseline.get(backend, {}).get(size)
+        if reference is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            if metric not in reference or (metric in TIMED_METRICS and not same_machine):
+                continue
+            threshold: float = thresholds.get(metric, 0.25)
+            old, new = reference[metric], result[metric]
+            change: float = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                failures.append(f"{size} players {metric}: {old:.2f} -> {new:.2f} ({change:.0%} worse, limit {threshold:.0%})")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the game engine end to end.")
+    parser.add_argument("--backend", choices=["mock", "http"], default="mock")
+    parser.add_argument("--players", type=int, nargs="+", default=[15, 50, 150])
+    parser.add_argument("--games", type=int, help="Games per player count (default: 150 // players, at least 1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed words (http backend)")
+    parser.add_argument("--ramble", type=int, default=0, help="Words the fake server adds after the action tags (http backend)")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds the fake server takes to load the model, again when num_ctx changes (http backend)")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of calls the fake server never answers (http backend)")
+    parser.add_argument("--call-timeout", type=float, help="Deadline in seconds for every LLM call")
+    parser.add_argument("--hosts", type=int, default=1, help="Fake servers to balance the calls over (http backend)")
+    parser.add_argument("--parallel", type=int, help="Requests each fake server generates at once (http backend)")
+    parser.add_argument("--max-in-flight", type=int, help="Calls the balancer sends each host at once (default: --parallel or 4)")
+    parser.add_argument("--hedge", action="store_true", help="Send calls slower than the 95th percentile to a second host")
+    parser.add_argument("--concurrency", type=int, help="LLM calls a game has in flight at once (default: the game's 8)")
+    parser.add_argument("--stream", action="store_true", help="Stream vote and night calls without a stop sequence and stop at the closing tag (http backend)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", help="Put a disk response cache at this path in front of the backend")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="Exit with an error on regressions")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    debug_capture.configure(enabled=False)
+    instrument()
+    results: dict[str, dict] = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline: dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        if baseline.get("machine") != machine_id():
+            # Timings of the other backends came from another machine, keep only the thresholds
+            baseline = {"thresholds": baseline.get("thresholds", {metric: 0.25 for metric in TRACKED_METRICS})}
+        baseline["machine"] = machine_id()
+        baseline[args.backend] = {
+            size: {metric: round(result[metric], 3) for metric in TRACKED_METRICS}
+            for size, result in results.items()
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if baseline.get("machine") != machine_id():
+        print(f"The baseline was recorded on {baseline.get('machine', 'another machine')}, so only peak memory is "
+              f"checked. Record one here with --update-baseline to check the timings too.")
+    failures: list[str] = check_regressions(results, baseline, args.backend)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# fake_ollama.py
+# Minimal local stand-in for the Ollama HTTP API, used by the benchmarks.
+# Answers /api/chat (streaming and non-streaming) with valid action tags picked from the prompt.
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import re
+import time
+
+ROSTER_PATTERN = re.compile(r"^\d+ (\S+) Alive", re.MULTILINE)
+USAGE_PATTERN = re.compile(r"Usage: <(\w+)>")
+FILLER: list[str] = "And that is all I have to say about it.".split()
+
+
+class FakeOllamaServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 token_latency: float = 0.0, seed: int | None = None, ramble: int = 0, load_latency: float = 0.0,
+                 stall_rate: float = 0.0, parallel: int | None = None):
+        self.host: str = host
+        self.port: int = port
+        self.latency: float = latency
+        self.token_latency: float = token_latency
+        # Words of filler after the action tags, like small models tend to add
+        self.ramble: int = ramble
+        # Seconds the first request for a model waits for it to load, later requests find it loaded
+        self.load_latency: float = load_latency
+        # Model -> num_ctx it was loaded with and the load
+        self.loads: dict[str, tuple[int | None, asyncio.Future]] = {}
+        # Share of chat requests that never get an answer, like a hung generation
+        self.stall_rate: float = stall_rate
+        # Requests generated at once, None for no limit
+        self.parallel: int | None = parallel
+        self.slots: asyncio.Semaphore | None = asyncio.Semaphore(parallel) if parallel else None
+        self.rng: random.Random = random.Random(seed)
+        self.requests: int = 0
+        self.server: asyncio.AbstractServer | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Keep-alive: serve requests until the client hangs up
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+
+                headers: dict[str, str] = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    key, value = line.split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self.handle_request(method, path, json.loads(body) if body else {}, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down while a response is being generated
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, method: str, path: str, payload: dict, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        if path == "/api/version":
+            await self.send_json(writer, {"version": "0.0.0-fake"})
+            return
+        if path == "/api/ps":
+            await self.send_json(writer, {"models": []})
+            return
+        if path != "/api/chat":
+            await self.send_json(writer, {"error": f"unknown path {path}"}, status="404 Not Found")
+            return
+
+        self.requests += 1
+        started: float = time.perf_counter()
+        model: str = payload.get("model", "")
+        messages: list[dict] = payload.get("messages") or []
+        prompt: str = messages[-1]["content"] if messages else ""
+        content, done_reason = self.limit(self.respond(prompt), payload.get("options") or {}) if messages else ("", "stop")
+        prompt_tokens: int = sum(len(message.get("content", "")) for message in messages) // 4
+        load_duration: int = await self.load(model, (payload.get("options") or {}).get("num_ctx"))
+        if not messages:
+            # Ollama only loads the model when there is nothing to answer
+            await self.send_json(writer, {"model": model, "created_at": "1970-01-01T00:00:00Z",
+                                          "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "load"})
+            return
+
+        # Like a server with OLLAMA_NUM_PARALLEL set, requests beyond it wait for a slot
+        async with self.slots or contextlib.nullcontext():
+            if self.stall_rate and self.rng.random() < self.stall_rate:
+                # Hang until the client gives up. Only reading sees it hang up, the writer keeps looking open.
+                await reader.read()
+                return
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            def final(text: str) -> dict:
+                return {
+                    "model": model,
+                    "created_at": "1970-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": text},
+                    "done": True,
+                    "done_reason": done_reason,
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "load_duration": load_duration,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": 0,
+                    "eval_count": len(content) // 4,
+                    "eval_duration": 0,
+                }
+
+            words: list[str] = re.findall(r"\S+\s*", content)
+            if not payload.get("stream", True):
+                # The whole answer is generated before anything is sent
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency * len(words))
+                await self.send_json(writer, final(content))
+                return
+
+            # Stream word by word as newline delimited JSON
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for word in words:
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency)
+                if writer.is_closing():
+                    # The client hung up, stop generating like Ollama does
+                    return
+                chunk = {"model": model, "created_at": "1970-01-01T00:00:00Z",
+                         "message": {"role": "assistant", "content": word}, "done": False}
+                self.write_chunk(writer, json.dumps(chunk).encode() + b"\n")
+                await writer.drain()
+            self.write_chunk(writer, json.dumps(final("")).encode() + b"\n")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def load(self, model: str, num_ctx: int | None) -> int:
+        """
+        Wait for the model to be loaded, requests arriving during the load wait for the same one. Like Ollama,
+        a request with another num_ctx than the model was loaded with loads it again. Nanoseconds waited.
+        """
+        if not self.load_latency:
+            return 0
+        loaded: tuple[int | None, asyncio.Future] | None = self.loads.get(model)
+        if loaded is None or loaded[0] != num_ctx:
+            loaded = self.loads[model] = (num_ctx, asyncio.ensure_future(asyncio.sleep(self.load_latency)))
+        started: float = time.perf_counter()
+        await asyncio.shield(loaded[1])
+        return int((time.perf_counter() - started) * 1e9)
+
+    def respond(self, prompt: str) -> str:
+        """Answer with one tag per action advertised in the prompt, targeting a living player."""
+        names: list[str] = ROSTER_PATTERN.findall(prompt)
+        tags: list[str] = USAGE_PATTERN.findall(prompt)
+        if not tags and "<VOTE>" in prompt:
+            tags = ["VOTE"]
+
+        parts: list[str] = []
+        for tag in dict.fromkeys(tags):
+            target: str = self.rng.choice(names) if names else ""
+            text: str = f"I don't trust {target}." if tag == "SPEAK" else target
+            parts.append(f"<{tag}>{text}</{tag}>")
+
+        filler: list[str] = [FILLER[i % len(FILLER)] for i in range(self.ramble)]
+        return " ".join(["Let me think about this for a moment."] + parts + filler)
+
+    @staticmethod
+    def limit(content: str, options: dict) -> tuple[str, str]:
+        """
+        Apply num_predict (one word per token) and stop sequences, which Ollama leaves out of the answer.
+        Returns the answer and its done_reason, "length" when num_predict cut it off before any stop sequence.
+        """
+        done_reason: str = "stop"
+        words: list[str] = re.findall(r"\S+\s*", content)
+        if options.get("num_predict") and len(words) > options["num_predict"]:
+            content = "".join(words[:options["num_predict"]])
+            done_reason = "length"
+        for stop in options.get("stop") or []:
+            position: int = content.find(stop)
+            if position != -1:
+                content = content[:position]
+                done_reason = "stop"
+        return content, done_reason
+
+    @staticmethod
+    def write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    @staticmethod
+    async def send_json(writer: asyncio.StreamWriter, payload: dict, status: str = "200 OK") -> None:
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+
+async def serve(port: int, servers: int, latency: float, token_latency: float, ramble: int, load_latency: float,
+                stall_rate: float, parallel: int | None) -> None:
+    """Run servers fake Ollama servers on consecutive ports, like several inference machines."""
+    for i in range(servers):
+        server = FakeOllamaServer(port=port + i, latency=latency, token_latency=token_latency, ramble=ramble,
+                                  load_latency=load_latency, stall_rate=stall_rate, parallel=parallel)
+        await server.start()
+        print(f"Fake Ollama listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarks.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--servers", type=int, default=1, help="Servers to run, on consecutive ports from --port")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response starts")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed words")
+    parser.add_argument("--ramble", type=int, default=0, help="Words of filler after the action tags")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds the first request for each model waits for it to load")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of requests that are never answered")
+    parser.add_argument("--parallel", type=int, help="Requests each server generates at once, the rest wait")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.servers, args.latency, args.token_latency, args.ramble, args.load_latency,
+                      args.stall_rate, args.parallel))
@@ -0,0 +1,7 @@
+# LLM backends used by the agents
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+from game.backends.mock import MockBackend
+from game.backends.ollama import OllamaBackend
+from game.backends.cache import CachingBackend, ResponseCache
+from game.backends.replay import RecordingBackend, ReplayBackend, ReplayDivergence
+from game.backends.balancer import BalancedBackend
@@ -0,0 +1,263 @@
+# balancer.py
+# Spreads the calls of a game over several backends, usually Ollama servers on different machines.
+import asyncio
+import time
+import weakref
+from collections import deque
+
+import httpx
+
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.phase import Phase
+    from game.player import Player
+
+
+def is_host_failure(error: Exception) -> bool:
+    """
+    Whether the error says the host is in trouble: it can't be reached, the connection broke or it answered
+    with a server error. Request errors, like a model that isn't pulled or a bad option, are the caller's.
+    """
+    if isinstance(error, (httpx.TransportError, OSError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+class Host:
+    def __init__(self, backend: LLMBackend, max_in_flight: int):
+        self.backend: LLMBackend = backend
+        self.name: str = getattr(backend, "host", None) or type(backend).__name__
+        # Calls this host works on at once, more queue up in the balancer instead of on the server
+        self.max_in_flight: int = max_in_flight
+        self.in_flight: int = 0
+        self.healthy: bool = True
+        # Loop time after which an unhealthy host gets checked again
+        self.check_at: float = 0.0
+        self.calls: int = 0
+        self.failures: int = 0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_in_flight
+
+    @property
+    def full(self) -> bool:
+        return self.in_flight >= self.max_in_flight
+
+    def __repr__(self):
+        return f"<Host {self.name} in_flight={self.in_flight}/{self.max_in_flight} healthy={self.healthy}>"
+
+
+class BalancedBackend(LLMBackend):
+    """
+    Sends each call to the healthy host with the fewest calls in flight relative to its cap, preferring the
+    host that served the player's previous call, whose prompt cache still holds that player's prompt.
+    A host that can't be reached or answers with a server error is left out until a health check finds it
+    answering again, and the call moves on to the next host. Request errors go straight back to the caller. With hedging, a call still running after the phase's 95th percentile latency
+    is also sent to a second host with room, the first answer wins and the other call is cancelled.
+    """
+
+    def __init__(self, backends: list[LLMBackend], max_in_flight: int | list[int] = 4, hedge: bool = False,
+                 hedge_quantile: float = 0.95, health_interval: float = 10.0, health_timeout: float = 2.0):
+        if not backends:
+            raise ValueError("The balancer needs at least one backend.")
+        caps: list[int] = max_in_flight if isinstance(max_in_flight, list) else [max_in_flight] * len(backends)
+        self.hosts: list[Host] = [Host(backend, cap) for backend, cap in zip(backends, caps, strict=True)]
+        self.hedge: bool = hedge
+        self.hedge_quantile: float = hedge_quantile
+        # Seconds between health checks of a host that failed
+        self.health_interval: float = health_interval
+        self.health_timeout: float = health_timeout
+        # Host of each player's last call, weak so a balancer shared by many games doesn't keep their players
+        self.affinity: weakref.WeakKeyDictionary['Player', Host] = weakref.WeakKeyDictionary()
+        # Calls waiting for a host with room
+        self.waiters: deque[asyncio.Future] = deque()
+        # Recent latencies per phase and the hedge delay derived from them
+        self.latencies: dict['Phase | None', deque[float]] = {}
+        self.hedge_delays: dict['Phase | None', float] = {}
+        self.samples: dict['Phase | None', int] = {}
+        # Running health checks, referenced so they aren't collected midway
+        self.checks: set[asyncio.Task] = set()
+        self.hedges: int = 0
+        self.hedges_won: int = 0
+        self.failovers: int = 0
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        tried: list[Host] = []
+        while True:
+            host: Host = await self.acquire(request, tried)
+            tried.append(host)
+            try:
+                return await self.hedged(host, request)
+            except Exception as e:
+                # A request error fails everywhere. Otherwise every host failed this call, or the rest are down too.
+                if (not is_host_failure(e) or len(tried) == len(self.hosts)
+                        or not any(h.healthy for h in self.hosts if h not in tried)):
+                    raise
+                self.failovers += 1
+                request.increment("llm_host_failovers")
+
+    async def hedged(self, host: Host, request: LLMRequest) -> LLMResult:
+        started: float = time.perf_counter()
+        delay: float | None = self.hedge_delays.get(request.phase) if self.hedge else None
+        if delay is None:
+            result: LLMResult = await self.call(host, request)
+        else:
+            result = await self.race(host, request, delay)
+        if self.hedge:
+            # Latency as the game sees it, a call won by its hedge still counts as slow
+            self.record_latency(request.phase, time.perf_counter() - started)
+        return result
+
+    async def race(self, host: Host, request: LLMRequest, delay: float) -> LLMResult:
+        """Give the call delay seconds on its host, then race it against a copy on a second host with room."""
+        primary: asyncio.Task = asyncio.ensure_future(self.call(host, request))
+        calls: set[asyncio.Task] = {primary}
+        try:
+            done, calls = await asyncio.wait(calls, timeout=delay)
+            if not done:
+                second: Host | None = self.pick(request, [host])
+                if second is not None and not second.full:
+                    second.in_flight += 1
+                    self.hedges += 1
+                    request.increment("llm_hedged_calls")
+                    calls.add(asyncio.ensure_future(self.call(second, request)))
+                done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+            while True:
+                # Looking at every exception keeps asyncio from warning about the ones left unread
+                failed: list[asyncio.Task] = [task for task in done if task.exception() is not None]
+                for task in done:
+                    if task not in failed:
+                        if task is not primary:
+                            self.hedges_won += 1
+                            request.increment("llm_hedges_won")
+                        return task.result()
+                if not calls:
+                    return failed[0].result()
+                done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in calls:
+                task.cancel()
+
+    async def call(self, host: Host, request: LLMRequest) -> LLMResult:
+        """Send the request to a host the call is already counted as in flight on."""
+        try:
+            result: LLMResult = await host.backend.chat(request)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_host_failure(e):
+                host.failures += 1
+                self.mark_down(host)
+            raise
+        finally:
+            host.in_flight -= 1
+            self.wake()
+        host.calls += 1
+        if request.player is not None:
+            self.affinity[request.player] = host
+        return result
+
+    async def acquire(self, request: LLMRequest, exclude: list[Host]) -> Host:
+        """Wait for a host with room and count the call as in flight there."""
+        while True:
+            host: Host | None = self.pick(request, exclude)
+            if host is None:
+                raise ConnectionError("No host left to send the call to.")
+            if not host.full:
+                host.in_flight += 1
+                return host
+            waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if not waiter.done():
+                    self.waiters.remove(waiter)
+
+    def pick(self, request: LLMRequest, exclude: list[Host]) -> Host | None:
+        """The least loaded healthy host, or the player's last host when it is as little loaded."""
+        now: float = time.monotonic()
+        candidates: list[Host] = [host for host in self.hosts if host.healthy and host not in exclude]
+        for host in self.hosts:
+            if not host.healthy and now >= host.check_at:
+                host.check_at = now + self.health_interval
+                check: asyncio.Task = asyncio.ensure_future(self.check(host))
+                self.checks.add(check)
+                check.add_done_callback(self.checks.discard)
+        if not candidates:
+            # Every host seems down, trying one beats failing the call outright
+            candidates = [host for host in self.hosts if host not in exclude]
+            if not candidates:
+                return None
+
+        best: Host = min(candidates, key=lambda host: host.load)
+        previous: Host | None = self.affinity.get(request.player) if request.player is not None else None
+        if previous is not None and previous in candidates and previous.load <= best.load:
+            return previous
+        return best
+
+    def wake(self) -> None:
+        while self.waiters:
+            waiter: asyncio.Future = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def mark_down(self, host: Host) -> None:
+        if host.healthy:
+            host.healthy = False
+            host.check_at = time.monotonic() + self.health_interval
+
+    async def check(self, host: Host) -> None:
+        try:
+            healthy: bool = await asyncio.wait_for(host.backend.health(), self.health_timeout)
+        except Exception:
+            healthy = False
+        if healthy:
+            host.healthy = True
+            for _ in range(host.max_in_flight):
+                self.wake()
+
+    def record_latency(self, phase: 'Phase | None', seconds: float) -> None:
+        window: deque[float] | None = self.latencies.get(phase)
+        if window is None:
+            window = self.latencies[phase] = deque(maxlen=256)
+        window.append(seconds)
+        samples: int = self.samples.get(phase, 0) + 1
+        self.samples[phase] = samples
+        # Sorting the window every call would cost more than the rest of the balancer
+        if samples >= 20 and samples % 16 == 0:
+            ordered: list[float] = sorted(window)
+            self.hedge_delays[phase] = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+
+    def stats(self) -> dict:
+        return {
+            "hosts": {host.name: {"calls": host.calls, "failures": host.failures, "healthy": host.healthy}
+                      for host in self.hosts},
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+        }
+
+    async def health(self) -> bool:
+        results = await asyncio.gather(*(host.backend.health() for host in self.hosts), return_exceptions=True)
+        return any(result is True for result in results)
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        """Load the model on every host at once, a host that can't is left out until it answers again."""
+        async def preload_host(host: Host) -> bool:
+            try:
+                return await host.backend.preload(model, keep_alive, num_ctx)
+            except Exception:
+                self.mark_down(host)
+                return False
+
+        return any(await asyncio.gather(*(preload_host(host) for host in self.hosts)))
+
+    async def close(self) -> None:
+        for host in self.hosts:
+            await host.backend.close()
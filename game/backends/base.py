@@ -0,0 +1,83 @@
+# base.py
+# Backend interface used by LLMAgent to talk to a language model.
+from abc import ABC, abstractmethod
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.metrics import MetricsRecorder
+    from game.parser import GameAction
+    from game.phase import Phase
+    from game.player import Player
+
+
+class LLMRequest:
+    def __init__(self, model: str, messages: list[dict], options: dict | None = None,
+                 phase: 'Phase | None' = None, actions: list['GameAction'] | None = None,
+                 player: 'Player | None' = None, keep_alive: str | float | None = None,
+                 metrics: 'MetricsRecorder | None' = None):
+        self.model: str = model
+        self.messages: list[dict] = messages
+        self.options: dict = options or {}
+        # Context about the call, backends may use it to shape or route the request
+        self.phase: 'Phase | None' = phase
+        self.actions: list['GameAction'] = actions or []
+        self.player: 'Player | None' = player
+        # How long the server should keep the model loaded after this call, e.g. "30m", None for its default
+        self.keep_alive: str | float | None = keep_alive
+        # Metrics of the game the call belongs to, where backends count what they did with it
+        self.metrics: 'MetricsRecorder | None' = metrics
+
+    def increment(self, counter: str) -> None:
+        """Count something a backend did with this call, e.g. a cache hit, in the game's metrics."""
+        if self.metrics is not None:
+            self.metrics.increment(counter)
+
+    @property
+    def prompt(self) -> str:
+        """The text of the last message, usually the player prompt."""
+        return self.messages[-1]["content"] if self.messages else ""
+
+    def __repr__(self):
+        return f"<LLMRequest model={self.model} phase={self.phase} actions={[a.name for a in self.actions]}>"
+
+
+class LLMResult:
+    def __init__(self, content: str, prompt_eval_count: int = 0, eval_count: int = 0,
+                 total_duration: int = 0, load_duration: int = 0,
+                 prompt_eval_duration: int = 0, eval_duration: int = 0, done_reason: str = ""):
+        self.content: str = content
+        # Why generation ended as reported by Ollama: "stop" for the end of the answer or a stop sequence,
+        # "length" when num_predict cut it off, empty when unknown
+        self.done_reason: str = done_reason
+        # Token counts and durations (nanoseconds) as reported by Ollama
+        self.prompt_eval_count: int = prompt_eval_count
+        self.eval_count: int = eval_count
+        self.total_duration: int = total_duration
+        self.load_duration: int = load_duration
+        self.prompt_eval_duration: int = prompt_eval_duration
+        self.eval_duration: int = eval_duration
+
+    def __repr__(self):
+        return f"<LLMResult tokens={self.prompt_eval_count}+{self.eval_count} content={self.content[:20]}>"
+
+
+class LLMBackend(ABC):
+    @abstractmethod
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        """Generate a completion for the request."""
+        ...
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        """
+        Load the model ahead of the first call, with the context window the calls will use when num_ctx
+        is given. Returns False when the backend has nothing to load.
+        """
+        return False
+
+    async def health(self) -> bool:
+        """Whether the backend can take calls right now."""
+        return True
+
+    async def close(self) -> None:
+        """Release any resources held by the backend."""
+        pass
@@ -0,0 +1,124 @@
+# cache.py
+# Disk-backed LRU cache of LLM responses, for seeded replays and regression runs.
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+
+
+def request_key(request: LLMRequest) -> str:
+    """Hash of everything that determines the model's answer: model, prompts and options."""
+    payload = json.dumps([request.model, request.messages, request.options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of compressed responses with a size cap, the least recently used entries are evicted first."""
+
+    def __init__(self, path: str = "llm_cache.sqlite", max_bytes: int = 256 * 1024 * 1024):
+        self.path: str = path
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self._lock: threading.Lock = threading.Lock()
+        self._db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content BLOB NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL, "
+            "done_reason TEXT NOT NULL DEFAULT 'stop')"
+        )
+        columns: list[str] = [row[1] for row in self._db.execute("PRAGMA table_info(responses)")]
+        if "done_reason" not in columns:
+            # Caches from before done_reason was kept, their answers were treated as stopped
+            self._db.execute("ALTER TABLE responses ADD COLUMN done_reason TEXT NOT NULL DEFAULT 'stop'")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+        total, clock = self._db.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM responses").fetchone()
+        self.total_bytes: int = total
+        self._clock: int = clock
+
+    def get(self, key: str) -> tuple[str, str] | None:
+        """The cached content and done_reason of the key's response."""
+        with self._lock:
+            row = self._db.execute("SELECT content, done_reason FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._clock += 1
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (self._clock, key))
+            self._db.commit()
+            return zlib.decompress(row[0]).decode("utf-8"), row[1]
+
+    def put(self, key: str, content: str, done_reason: str = "stop") -> None:
+        blob: bytes = zlib.compress(content.encode("utf-8"))
+        with self._lock:
+            self._clock += 1
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self.total_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, content, size, last_used, done_reason) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), self._clock, done_reason),
+            )
+            self.total_bytes += len(blob)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries until the store fits its cap."""
+        while self.total_bytes > self.max_bytes:
+            rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "bytes": self.total_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CachingBackend(LLMBackend):
+    """Serves repeated requests from a ResponseCache and only calls the wrapped backend on a miss."""
+
+    def __init__(self, inner: LLMBackend, cache: ResponseCache):
+        self.inner: LLMBackend = inner
+        self.cache: ResponseCache = cache
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        key: str = request_key(request)
+        # SQLite does blocking I/O, keep it off the event loop
+        cached: tuple[str, str] | None = await asyncio.to_thread(self.cache.get, key)
+        request.increment("llm_cache_hits" if cached is not None else "llm_cache_misses")
+        if cached is not None:
+            return LLMResult(cached[0], done_reason=cached[1])
+
+        result: LLMResult = await self.inner.chat(request)
+        await asyncio.to_thread(self.cache.put, key, result.content, result.done_reason)
+        return result
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        return await self.inner.preload(model, keep_alive, num_ctx)
+
+    async def health(self) -> bool:
+        return await self.inner.health()
+
+    async def close(self) -> None:
+        await self.inner.close()
+        self.cache.close()
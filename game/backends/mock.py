@@ -0,0 +1,82 @@
+# mock.py
+# Fast deterministic backend for running the engine without a model.
+import asyncio
+import random
+from typing import Callable
+
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+
+SPEECHES = [
+    "I don't trust {name}.",
+    "{name} has been way too quiet.",
+    "I think {name} might be the mafia.",
+    "Let's hear what {name} has to say.",
+    "I'm not sure yet, but {name} is acting strange.",
+]
+
+
+class MockBackend(LLMBackend):
+    """
+    Answers every request with valid action tags.
+    A script (list of raw responses or a callable taking the request) is used first,
+    after that a seeded random policy picks living targets for the requested actions.
+    """
+
+    def __init__(self, seed: int | None = None, latency: float = 0.0, jitter: float = 0.0,
+                 silence_rate: float = 0.1, script: list[str] | Callable[[LLMRequest], str | None] | None = None):
+        self.rng: random.Random = random.Random(seed)
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.silence_rate: float = silence_rate
+        self.script: list[str] | Callable[[LLMRequest], str | None] | None = script
+        self.calls: int = 0
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        self.calls += 1
+        # Decide everything before sleeping so the answers don't depend on which call finishes first
+        delay: float = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        content: str | None = self.scripted(request)
+        if content is None:
+            content = self.policy(request)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        return LLMResult(
+            content=content,
+            prompt_eval_count=sum(len(message["content"]) for message in request.messages) // 4,
+            eval_count=len(content) // 4,
+            total_duration=int(delay * 1e9),
+            done_reason="stop",
+        )
+
+    def scripted(self, request: LLMRequest) -> str | None:
+        """Get the next scripted response, if any."""
+        if callable(self.script):
+            return self.script(request)
+        if self.script:
+            return self.script.pop(0)
+        return None
+
+    def policy(self, request: LLMRequest) -> str:
+        """Emit one tag per requested action with a random living target."""
+        targets: list[str] = self.targets(request)
+        parts: list[str] = []
+        for action in request.actions:
+            target: str = self.rng.choice(targets) if targets else ""
+            if action.name == "SPEAK":
+                speech: str = "" if self.rng.random() < self.silence_rate else self.rng.choice(SPEECHES).format(name=target)
+                parts.append(f"<SPEAK>{speech}</SPEAK>")
+            elif self.rng.random() < self.silence_rate:
+                parts.append(f"<{action.name}></{action.name}>")
+            else:
+                parts.append(f"<{action.name}>{target}</{action.name}>")
+
+        return "Let me think. " + " ".join(parts)
+
+    def targets(self, request: LLMRequest) -> list[str]:
+        """Names of the living players other than the requester."""
+        player = request.player
+        if player is None:
+            return []
+        return [p.name for p in player._game.alive_players if p is not player]
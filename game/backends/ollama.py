@@ -0,0 +1,97 @@
+# ollama.py
+# Backend that talks to an Ollama server through the shared client registry.
+import httpx
+from ollama import AsyncClient, ResponseError
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+from game.llm_client import client_registry
+from game.parser import IncrementalTagParser
+from game.phase import Phase
+
+
+class OllamaBackend(LLMBackend):
+    def __init__(self, host: str | None = None, stream: bool = False,
+                 stop_phases: tuple[Phase, ...] = (Phase.VOTE, Phase.NIGHT)):
+        self.host: str | None = host
+        # Stream the calls of stop_phases and hang up once their action tag closes. Calls with a stop sequence
+        # aren't streamed: the server already ends them at the closing tag, so streaming would only add overhead.
+        # With the default generation profiles that is every single-action call, see game/generation.py.
+        self.stream: bool = stream
+        self.stop_phases: tuple[Phase, ...] = stop_phases
+
+    @property
+    def client(self) -> AsyncClient:
+        """The pooled client shared by every backend talking to the same host."""
+        return client_registry.get(self.host)
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        if self.stream and request.phase in self.stop_phases and request.actions and "stop" not in request.options:
+            return await self.chat_until_tag(request)
+
+        response = await self.client.chat(
+            model=request.model,
+            messages=request.messages,
+            options=request.options,
+            keep_alive=request.keep_alive,
+        )
+        return self.to_result(response['message']['content'], response)
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        """
+        A chat without messages makes Ollama load the model and return without generating anything. The load
+        is only kept for calls with the same num_ctx, any other makes Ollama load the model again.
+        """
+        options: dict | None = {"num_ctx": num_ctx} if num_ctx else None
+        await self.client.chat(model=model, messages=[], options=options, keep_alive=keep_alive)
+        return True
+
+    async def health(self) -> bool:
+        """Ask the server which models it has loaded, a cheap call that only needs it to be up."""
+        try:
+            await self.client.ps()
+        except (ResponseError, httpx.HTTPError, OSError):
+            return False
+        return True
+
+    async def chat_until_tag(self, request: LLMRequest) -> LLMResult:
+        """Stream the response and stop generating as soon as one of the request's action tags closes."""
+        tags: IncrementalTagParser = IncrementalTagParser([action.name for action in request.actions])
+        stream = await self.client.chat(
+            model=request.model,
+            messages=request.messages,
+            options=request.options,
+            keep_alive=request.keep_alive,
+            stream=True,
+        )
+
+        final = None
+        chunks: int = 0
+        try:
+            async for part in stream:
+                chunks += 1
+                closed: bool = tags.feed(part['message']['content'])
+                if part.get('done'):
+                    final = part
+                if closed:
+                    break
+        finally:
+            # Closing the stream drops the connection, which makes Ollama stop generating
+            await stream.aclose()
+
+        if final is None:
+            # Stopped early, Ollama only reports the counts in its last chunk. Each chunk is about one token.
+            request.increment("llm_streams_stopped_early")
+            return LLMResult(content=tags.text, eval_count=chunks, done_reason="stop")
+        return self.to_result(tags.text, final)
+
+    @staticmethod
+    def to_result(content: str, response) -> LLMResult:
+        return LLMResult(
+            content=content,
+            prompt_eval_count=response.get('prompt_eval_count') or 0,
+            eval_count=response.get('eval_count') or 0,
+            total_duration=response.get('total_duration') or 0,
+            load_duration=response.get('load_duration') or 0,
+            prompt_eval_duration=response.get('prompt_eval_duration') or 0,
+            eval_duration=response.get('eval_duration') or 0,
+            done_reason=response.get('done_reason') or "",
+        )
@@ -0,0 +1,174 @@
+# replay.py
+# Record every raw LLM response of a game, then replay the game from the recording without any LLM calls.
+import asyncio
+import json
+
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+from game.backends.cache import request_key
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.engine import Game
+
+
+class ReplayDivergence(Exception):
+    """Raised when a replay can't continue: no recorded response, or a changed prompt in strict mode."""
+    pass
+
+
+def call_key(request: LLMRequest) -> str:
+    return request.player.name if request.player is not None else ""
+
+
+class RecordingBackend(LLMBackend):
+    """
+    Wraps a backend and appends every response to a JSONL file with the hash of its prompt.
+    The first line records the game setup so the replay can rebuild the same game.
+    """
+
+    def __init__(self, inner: LLMBackend, path: str):
+        self.inner: LLMBackend = inner
+        self.path: str = path
+        self.file = open(path, "w", encoding="utf-8", buffering=1)
+        self.header_written: bool = False
+        # Calls per player, each player's calls happen one after another so this orders them
+        self.sequence: dict[str, int] = {}
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        if not self.header_written and request.player is not None:
+            self.write_header(request.player._game)
+
+        key: str = call_key(request)
+        sequence: int = self.sequence.get(key, 0)
+        self.sequence[key] = sequence + 1
+
+        try:
+            result: LLMResult = await self.inner.chat(request)
+        except asyncio.CancelledError:
+            # Only a missed deadline is part of the game, the replay times out the same call. Other
+            # cancellations, like a hedged duplicate losing or the game shutting down, aren't recorded.
+            if request.player is None or not request.player._game.deadlines.timed_out():
+                raise
+            self.file.write(json.dumps({
+                "player": key,
+                "sequence": sequence,
+                "phase": request.phase.value[1] if request.phase else None,
+                "prompt_hash": request_key(request),
+                "timed_out": True,
+            }) + "\n")
+            raise
+        self.file.write(json.dumps({
+            "player": key,
+            "sequence": sequence,
+            "phase": request.phase.value[1] if request.phase else None,
+            "prompt_hash": request_key(request),
+            "content": result.content,
+            "done_reason": result.done_reason,
+        }) + "\n")
+        return result
+
+    def write_header(self, game: 'Game') -> None:
+        self.file.write(json.dumps({
+            "seed": game.seed,
+            "player_count": game.player_count,
+            "roles": [role.name for role in game.roles],
+            "model_name": game.model_name,
+            "first_day_speak_rounds": game.first_day_speak_rounds,
+            "day_speak_rounds": game.day_speak_rounds,
+            "sessions": game.sessions,
+            # Settings that change the prompts or the order of the calls, to trace a divergence back to them
+            "concurrent_voting": game.concurrent_voting,
+            "max_concurrent_calls": game.max_concurrent_calls,
+            "max_context_tokens": game.max_context_tokens,
+            "response_tokens": game.response_tokens,
+            "generation_profiles": {name: vars(profile) for name, profile in game.generation_profiles.items()},
+            "call_timeouts": {phase.name: timeout for phase, timeout in game.call_timeouts.items()},
+            "call_retries": game.call_retries,
+            "max_consecutive_fallbacks": game.max_consecutive_fallbacks,
+        }) + "\n")
+        self.header_written = True
+
+    async def preload(self, model: str, keep_alive: str | float | None = None, num_ctx: int | None = None) -> bool:
+        return await self.inner.preload(model, keep_alive, num_ctx)
+
+    async def health(self) -> bool:
+        return await self.inner.health()
+
+    async def close(self) -> None:
+        await self.inner.close()
+        self.file.close()
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Answers with the recorded responses and notes every call whose prompt differs from the recording.
+    A call with no recorded response always ends the replay, a changed prompt only does with strict.
+    """
+
+    def __init__(self, path: str, strict: bool = False):
+        self.path: str = path
+        self.strict: bool = strict
+        self.records: dict[tuple[str, int], dict] = {}
+        self.sequence: dict[str, int] = {}
+        self.divergences: list[dict] = []
+
+        with open(path, "r", encoding="utf-8") as f:
+            self.header: dict = json.loads(f.readline())
+            for line in f:
+                record: dict = json.loads(line)
+                self.records[(record["player"], record["sequence"])] = record
+
+    async def chat(self, request: LLMRequest) -> LLMResult:
+        key: str = call_key(request)
+        sequence: int = self.sequence.get(key, 0)
+        self.sequence[key] = sequence + 1
+
+        record: dict | None = self.records.get((key, sequence))
+        prompt_hash: str = request_key(request)
+        if record is None or record["prompt_hash"] != prompt_hash:
+            divergence: dict = {
+                "player": key,
+                "sequence": sequence,
+                "phase": request.phase.value[1] if request.phase else None,
+                "reason": "missing response" if record is None else "prompt changed",
+            }
+            self.divergences.append(divergence)
+            if self.strict or record is None:
+                raise ReplayDivergence(f"{divergence['reason']} for {key} call {sequence} ({divergence['phase']})")
+
+        if record.get("timed_out"):
+            raise asyncio.TimeoutError()
+        # Recordings from before done_reason was kept had every stopped answer repaired
+        return LLMResult(record["content"], done_reason=record.get("done_reason", "stop"))
+
+    def create_game(self, **game_kwargs) -> 'Game':
+        """Build the recorded game. Extra keyword arguments (history_sinks, metrics) go to Game."""
+        from game.engine import Game
+        from game.generation import GenerationProfile
+        from game.phase import Phase
+        from game.roles import create_role
+
+        game: Game = Game(
+            player_count=self.header["player_count"],
+            roles=[create_role(name) for name in self.header["roles"]],
+            seed=self.header["seed"],
+            model_name=self.header["model_name"],
+            backend=self,
+            **game_kwargs,
+        )
+        game.first_day_speak_rounds = self.header["first_day_speak_rounds"]
+        game.day_speak_rounds = self.header["day_speak_rounds"]
+        game.sessions = self.header.get("sessions", False)
+        # Recordings made before these settings were recorded get the defaults
+        header: dict = self.header
+        game.concurrent_voting = header.get("concurrent_voting", game.concurrent_voting)
+        game.max_concurrent_calls = header.get("max_concurrent_calls", game.max_concurrent_calls)
+        game.max_context_tokens = header.get("max_context_tokens", game.max_context_tokens)
+        game.response_tokens = header.get("response_tokens", game.response_tokens)
+        if "generation_profiles" in header:
+            game.generation_profiles = {name: GenerationProfile(**profile) for name, profile in header["generation_profiles"].items()}
+        if "call_timeouts" in header:
+            game.call_timeouts = {Phase[name]: timeout for name, timeout in header["call_timeouts"].items()}
+        game.call_retries = header.get("call_retries", game.call_retries)
+        game.max_consecutive_fallbacks = header.get("max_consecutive_fallbacks", game.max_consecutive_fallbacks)
+        return game
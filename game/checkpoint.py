@@ -0,0 +1,57 @@
+# checkpoint.py
+# Save and restore full game state, so a crashed game can resume after its last completed phase.
+import asyncio
+import gzip
+import json
+import os
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.engine import Game
+
+CHECKPOINT_VERSION: int = 3
+
+
+def write_checkpoint(state: dict, path: str) -> None:
+    """Write the state as gzipped JSON, atomically so a crash never leaves a torn file."""
+    temporary_path: str = path + ".tmp"
+    with gzip.open(temporary_path, "wt", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(temporary_path, path)
+
+
+def read_checkpoint(path: str) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        state: dict = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')} in {path}.")
+    return state
+
+
+async def save_checkpoint(game: 'Game', path: str) -> None:
+    """Snapshot the game now and write it without blocking the event loop."""
+    state: dict = game.get_state()
+    state["version"] = CHECKPOINT_VERSION
+    await asyncio.to_thread(write_checkpoint, state, path)
+
+
+def load_checkpoint(path: str, **game_kwargs) -> 'Game':
+    """
+    Rebuild a game from a checkpoint. Extra keyword arguments (backend, history_sinks, metrics) go to Game.
+    Call game.start(resume=True) to continue it.
+    """
+    from game.engine import Game
+    from game.roles import create_role
+
+    state: dict = read_checkpoint(path)
+
+    # The same seed and role list deal the same names, roles and personalities again
+    game: Game = Game(
+        player_count=state["player_count"],
+        roles=[create_role(name) for name in state["roles"]],
+        seed=state["seed"],
+        model_name=state["model_name"],
+        **game_kwargs,
+    )
+    game.load_state(state)
+    return game
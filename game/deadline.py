@@ -0,0 +1,57 @@
+# deadline.py
+# Deadlines for LLM calls. A timer per call costs about as much as the engine spends on the call itself,
+# so the calls of a game share one timer, set for the earliest deadline, which cancels every overdue call.
+import asyncio
+
+
+class Deadlines:
+    def __init__(self):
+        # Task waiting on a call -> loop time the call has to be done by
+        self.pending: dict[asyncio.Task, float] = {}
+        # Tasks cancelled for missing their deadline, as opposed to cancelled from outside
+        self.expired: set[asyncio.Task] = set()
+        self.timer: asyncio.TimerHandle | None = None
+        self.timer_at: float = 0.0
+
+    async def run(self, coroutine, timeout: float):
+        """Await the coroutine, cancelling it and raising TimeoutError when it takes longer than timeout seconds."""
+        task: asyncio.Task = asyncio.current_task()
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        deadline: float = loop.time() + timeout
+        self.pending[task] = deadline
+        if self.timer is None or deadline < self.timer_at:
+            self.arm(loop, deadline)
+
+        try:
+            return await coroutine
+        except asyncio.CancelledError:
+            # Only swallow our own cancellation, a cancellation from outside still goes through
+            if task in self.expired and task.uncancel() == 0:
+                raise TimeoutError() from None
+            raise
+        finally:
+            del self.pending[task]
+            self.expired.discard(task)
+
+    def timed_out(self) -> bool:
+        """Whether the current task is being cancelled for missing its deadline, rather than from outside."""
+        return asyncio.current_task() in self.expired
+
+    def arm(self, loop: asyncio.AbstractEventLoop, when: float) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = loop.call_at(when, self.expire, loop)
+        self.timer_at = when
+
+    def expire(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Cancel the overdue calls, then wait for the next deadline. Calls that finished in time just left."""
+        self.timer = None
+        now: float = loop.time()
+        for task, deadline in self.pending.items():
+            if deadline <= now and task not in self.expired:
+                self.expired.add(task)
+                task.cancel()
+
+        remaining: list[float] = [deadline for task, deadline in self.pending.items() if task not in self.expired]
+        if remaining:
+            self.arm(loop, min(remaining))
@@ -0,0 +1,142 @@
+# debug_capture.py
+# Background capture of prompts and responses for debugging.
+# Records are queued by the agents and written by a worker thread so the event loop never blocks on disk I/O.
+import json
+import os
+import queue
+import random
+import threading
+from abc import ABC, abstractmethod
+
+
+class DebugRecord:
+    def __init__(self, kind: str, reference: str, text: str):
+        self.kind: str = kind  # "prompt" or "response"
+        self.reference: str = reference
+        self.text: str = text
+
+
+class DebugSink(ABC):
+    """Base class for debug capture sinks."""
+
+    @abstractmethod
+    def write_batch(self, records: list[DebugRecord]) -> None:
+        """Write the records, called from the worker thread."""
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class FilePerCallSink(DebugSink):
+    """Writes every prompt and response to its own file, e.g. prompts/debug_prompt_Alice_3.txt."""
+
+    def __init__(self, prompts_dir: str = "prompts", responses_dir: str = "response"):
+        self.directories: dict[str, tuple[str, str]] = {
+            "prompt": (prompts_dir, "debug_prompt"),
+            "response": (responses_dir, "debug_response"),
+        }
+        for directory, _ in self.directories.values():
+            os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, records: list[DebugRecord]) -> None:
+        for record in records:
+            directory, prefix = self.directories[record.kind]
+            with open(os.path.join(directory, f"{prefix}_{record.reference}.txt"), "w", encoding="utf-8") as f:
+                f.write(record.text)
+
+
+class JsonlDebugSink(DebugSink):
+    """Appends every record as one JSON line to a single file."""
+
+    def __init__(self, path: str = "debug_capture.jsonl"):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write_batch(self, records: list[DebugRecord]) -> None:
+        for record in records:
+            self.file.write(json.dumps({"kind": record.kind, "reference": record.reference, "text": record.text}) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class DebugCapture:
+    def __init__(self, sinks: list[DebugSink] | None = None, enabled: bool = True, sample_rate: float = 1.0,
+                 max_queue: int = 1024, batch_size: int = 64):
+        self.sinks: list[DebugSink] | None = sinks
+        self.enabled: bool = enabled
+        self.sample_rate: float = sample_rate
+        self.batch_size: int = batch_size
+        self.dropped: int = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._worker: threading.Thread | None = None
+        # Own generator so sampling never disturbs the game's randomness
+        self._rng: random.Random = random.Random()
+
+    def configure(self, enabled: bool | None = None, sample_rate: float | None = None,
+                  sinks: list[DebugSink] | None = None) -> None:
+        """Change the capture settings, e.g. configure(enabled=False) for production runs."""
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if sinks is not None:
+            self.flush()
+            for sink in self.sinks or []:
+                sink.close()
+            self.sinks = sinks
+
+    def sample(self) -> bool:
+        """Decide whether the next call should be captured."""
+        if not self.enabled or self.sample_rate <= 0:
+            return False
+        return self.sample_rate >= 1 or self._rng.random() < self.sample_rate
+
+    def capture_prompt(self, reference: str, text: str) -> None:
+        self._put(DebugRecord("prompt", reference, text))
+
+    def capture_response(self, reference: str, text: str) -> None:
+        self._put(DebugRecord("response", reference, text))
+
+    def _put(self, record: DebugRecord) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            if self.sinks is None:
+                # Default layout, created lazily so importing this module has no side effects
+                self.sinks = [FilePerCallSink()]
+            self._worker = threading.Thread(target=self._run, name="debug-capture", daemon=True)
+            self._worker.start()
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Never stall the game for debug output
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch: list[DebugRecord] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for sink in self.sinks:
+                try:
+                    sink.write_batch(batch)
+                except Exception as e:
+                    print(f"Debug capture sink {type(sink).__name__} failed: {e}")
+
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.join()
+
+
+# Shared by every agent in the process
+debug_capture: DebugCapture = DebugCapture()
@@ -1,10 +1,24 @@
 from ast import Dict
+import asyncio
+import inspect
 import string
+import time
 import random
+import uuid
 from typing import List
-from game.parser import GameAction, Parser, PlayerResponse, GameAction
+from game.backends import LLMBackend, OllamaBackend
+from game.checkpoint import save_checkpoint
+from game.deadline import Deadlines
+from game.debug_capture import debug_capture
+from game.event_log import EventLog, EventType
+from game.generation import DEFAULT_PROFILES, GenerationProfile
+from game.history import GameHistory, HistoryLevel, HistorySink, StdoutHistorySink, TextHistorySink
+from game.llm_client import client_registry
+from game.metrics import MetricsRecorder, metrics as default_metrics
+from game.parser import GameAction, ParsedAction, Parser, PlayerResponse
 from game.name import pick_multiple_names
 from game.player import Player, PlayerStatus
+from game.roster import Roster
 from game.roles.base import AttackingPower, DefensivePower, Role, RoleAlignment
 from game.phase import Phase
 
@@ -13,21 +27,81 @@ if TYPE_CHECKING:
     from game.roles.doctor import Doctor
 
 class Game:
-    def __init__(self, player_count: int = 15, roles: List[Role] = None) -> None:
+    def __init__(self, player_count: int = 15, roles: List[Role] = None, history_sinks: List[HistorySink] | None = None,
+                 backend: LLMBackend | None = None, metrics: MetricsRecorder | None = None, seed: int | None = None,
+                 model_name: str = "gemma3:4b") -> None:
         self.history: List[str] = []
+        self.model_name: str = model_name
+        self.winner: RoleAlignment | None = None
+        # Write a checkpoint here after every day, vote and night phase
+        self.checkpoint_path: str | None = None
+        # Every random choice of the game goes through its own generator so games are reproducible
+        self.seed: int = seed if seed is not None else random.randrange(2**32)
+        self.rng: random.Random = random.Random(self.seed)
+        self.game_id: str = uuid.uuid4().hex[:12]
+        # Per-call LLM metrics, shared process-wide unless a recorder is given
+        self.metrics: MetricsRecorder = metrics if metrics is not None else default_metrics
+        # Backend shared by every player's agent, Ollama unless told otherwise
+        self.backend: LLMBackend = backend if backend is not None else OllamaBackend()
+        # Stream the history to stdout and game_history.txt unless told otherwise
+        if history_sinks is None:
+            history_sinks = [StdoutHistorySink(), TextHistorySink("game_history.txt")]
+        self.history_log: GameHistory = GameHistory(history_sinks)
+        # What the players have been told, each player reads it through their own cursor
+        self.event_log: EventLog = EventLog(self)
 
         # Settings
         self.first_day_speak_rounds: int = 1
         self.day_speak_rounds: int = 3
+        # Send every vote to the LLM at once instead of one player at a time
+        self.concurrent_voting: bool = True
+        # Maximum number of LLM calls in flight at the same time
+        self.max_concurrent_calls: int = 8
+        # Seconds an LLM call may take in each phase before it is cancelled, None waits for as long as it takes
+        self.call_timeouts: dict[Phase, float | None] = {Phase.DAY: 180.0, Phase.VOTE: 120.0, Phase.NIGHT: 120.0}
+        # Attempts after a timeout, so a call takes at most its timeout times (call_retries + 1)
+        self.call_retries: int = 1
+        # Stands in for the response when every attempt timed out: stay silent, abstain, skip the night action
+        self.timeout_fallbacks: dict[Phase, str] = {Phase.DAY: "<SPEAK></SPEAK>", Phase.VOTE: "<VOTE></VOTE>", Phase.NIGHT: ""}
+        # The game gives up with a TimeoutError after this many calls in a row fell back, a model that stalls on
+        # every call would otherwise leave a game where nobody ever dies. None never gives up.
+        self.max_consecutive_fallbacks: int | None = 16
+        self.consecutive_fallbacks: int = 0
+        # Cancels the LLM calls that outlive their timeout
+        self.deadlines: Deadlines = Deadlines()
+        # Largest context window a prompt may use, the oldest day log lines are cut beyond it
+        self.max_context_tokens: int = 8192
+        # Tokens kept free in the context window for the response
+        self.response_tokens: int = 512
+        # Model -> context window its calls use. It only grows: Ollama reloads the model whenever num_ctx
+        # changes, so a smaller prompt keeps the larger window instead of costing a reload each way.
+        self.num_ctx: dict[str, int] = {}
+        # Keep the model loaded this long after every call, so it stays resident for the whole game.
+        # -1 pins it until the server restarts or unloads it.
+        self.keep_alive: str | float | None = "30m"
+        # Load every model the players use before the game starts, see warm_up
+        self.preload_models: bool = True
+        # Keep a conversation per player and send only what happened since their last turn, see game/session.py
+        self.sessions: bool = False
+        # A session starts over from the current game state once its turns fill this share of the context budget
+        self.session_compact_ratio: float = 0.6
+        # Parts of the last call of any player, to measure how much of the next one the server could reuse
+        self.last_parts: list[str] = []
+        # Context window of that call, a call with another one makes the server reload and start over
+        self.last_num_ctx: int = 0
+        # Action name -> token cap, temperature and stop sequences for calls expecting that action
+        self.generation_profiles: dict[str, GenerationProfile] = dict(DEFAULT_PROFILES)
 
         # Pick names for players
-        self.unassigned_names: List[str] = pick_multiple_names(player_count)
+        self.unassigned_names: List[str] = pick_multiple_names(player_count, self.rng)
 
         # Set up player count and player list
         self.player_count: int = player_count
         self.players: List[Player] = []
         self.alive_players: List[Player] = []
         self.dead_players: List[Player] = []
+        # Rendered roster prompts, shared between players who see the same thing
+        self.roster: Roster = Roster(self)
 
         self.parser: Parser = Parser()
         self.parser.register_action(GameAction("SPEAK", "<SPEAK>TEXT</SPEAK>", Phase.DAY, parse_speak_action))
@@ -48,7 +122,7 @@ class Game:
         self.roles = roles.copy()  # Keep a copy of the original roles for reference
         self.unassigned_roles: List[Role] = self.roles.copy()
         # Shuffle unassigned roles to randomize player roles
-        random.shuffle(self.unassigned_roles)
+        self.rng.shuffle(self.unassigned_roles)
 
         self.assigned_roles: List[Role] = []
         self.phase: Phase = Phase.DAY
@@ -56,7 +130,7 @@ class Game:
         for i in range(player_count):
             self.add_player(i + 1)
 
-        random.shuffle(self.assigned_roles)
+        self.rng.shuffle(self.assigned_roles)
 
         self.day_number: int = 0
 
@@ -87,46 +161,126 @@ class Game:
     def is_day(self) -> bool:
         return self.phase == Phase.DAY
 
-    async def start(self) -> None:
-        self.dead_to_announce: List[Player] = []
-        self.votes: dict[str, int] = {}
-
-        self.add_to_history("Game started with the following players:")
-        for player in self.players:
-            self.add_to_history(f"<{player.index}> {player.name} - {player.role.name}")
-            player.on_game_start(game=self)
+    async def start(self, resume: bool = False) -> None:
+        """Play the game. With resume, continue a game restored from a checkpoint."""
+        client_registry.acquire()
+        try:
+            if self.preload_models:
+                await self.warm_up()
+            await self.play(resume)
+        finally:
+            self.history_log.close()
+            # Close the pooled connections once the last running game is done
+            await client_registry.release()
+            # Wait for pending debug dumps without blocking other games on the loop
+            await asyncio.to_thread(debug_capture.flush)
+
+    async def play(self, resume: bool) -> None:
+        if not resume:
+            self.dead_to_announce: List[Player] = []
+            self.votes: dict[str, int] = {}
+            # The next step of the game loop: "day", "vote" or "night"
+            self.next_step: str = "day"
+
+            self.add_to_history(f"Game seed: {self.seed}")
+            self.add_to_history("Game started with the following players:")
+            for player in self.players:
+                self.add_to_history(f"<{player.index}> {player.name} - {player.role.name}")
+                player.on_game_start(game=self)
+        else:
+            self.add_to_history(f"Game resumed on day {self.day_number} before the {self.next_step} phase.")
 
-        # Main game loop
+        # Main game loop, a checkpoint is taken after every step
         while not self.is_game_over():
-            await self.day_phase()
-            if self.is_game_over():
-                break
-            await self.night_phase()
+            if self.next_step == "day":
+                await self.day_phase()
+                # There is no vote on the first day
+                self.next_step = "night" if self.day_number == 1 else "vote"
+            elif self.next_step == "vote":
+                await self.voting_phase()
+                self.next_step = "night"
+            else:
+                await self.night_phase()
+                self.next_step = "day"
+
+            if self.checkpoint_path:
+                await save_checkpoint(self, self.checkpoint_path)
 
         self.print_winner()
 
-    def add_to_history(self, message: str) -> None:
+    async def warm_up(self) -> None:
+        """
+        Load every model the players use, all at once, so the first speaker doesn't wait for a model load.
+        Each model is loaded with the context window its first calls will use, any other num_ctx would
+        make Ollama load it again. The load times go to the metrics apart from the calls. A failed load
+        is only logged, the game's own calls will report the problem if it persists.
+        """
+        # (backend, model) pairs, players may have their own backend or model
+        targets: dict[tuple[int, str], tuple[LLMBackend, str]] = {}
+        for player in self.players:
+            agent = player.llm_agent
+            targets.setdefault((id(agent.backend), agent.model_name), (agent.backend, agent.model_name))
+            # The largest opening prompt sets the window, the calls then keep it, see Player.finish_prompt
+            if player.is_alive():
+                self.num_ctx[agent.model_name] = max(self.num_ctx.get(agent.model_name, 0), player.opening_context_size())
+
+        async def preload(backend: LLMBackend, model: str) -> None:
+            started: float = time.perf_counter()
+            try:
+                loaded: bool = await backend.preload(model, self.keep_alive, self.num_ctx.get(model))
+            except Exception as e:
+                self.add_to_history(f"Could not preload {model}: {type(e).__name__}: {e}", HistoryLevel.DEBUG)
+                return
+            if loaded:
+                seconds: float = time.perf_counter() - started
+                self.metrics.record_preload(model, seconds)
+                self.add_to_history(f"Loaded {model} in {seconds:.2f}s", HistoryLevel.DEBUG)
+
+        await asyncio.gather(*(preload(backend, model) for backend, model in targets.values()))
+
+    def add_to_history(self, message: str, level: HistoryLevel = HistoryLevel.INFO) -> None:
         """Add a message to the game history."""
         self.history.append(message)
-        print(message)
+        self.history_log.add(message, self.day_number, level)
 
     def add_to_all_history(self, message: str) -> None:
-        """Add a message to the history of all players."""
-        for player in self.players:
-            player.add_to_history(message)
+        """Tell every player a message."""
+        self.event_log.announce(message)
+
+    async def gather_limited(self, coroutines: List) -> List:
+        """
+        Run coroutines concurrently, keeping at most max_concurrent_calls in flight. When one fails the
+        others are cancelled, so they don't keep calling the model for a game that is over.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_calls))
+
+        async def run(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        tasks: List[asyncio.Future] = [asyncio.ensure_future(run(coroutine)) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task, coroutine in zip(tasks, coroutines):
+                task.cancel()
+                # A call that never got a slot never started, close it so it isn't reported as never awaited
+                if inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                    coroutine.close()
+            raise
 
     async def simulate_chat(self) -> None:
         """Simulate a chat round where each player can speak."""
         # Get a random ordered list of alive players
-        players = random.sample(self.alive_players, len(self.alive_players))
+        players = self.rng.sample(self.alive_players, len(self.alive_players))
 
         # Use LLM-based chat for each player if available
         for player in players:
             message: PlayerResponse = await player.chat()
-            message = self.parser.parse(message)
+            message = self.parser.parse(message, player.role, self.phase)
 
-            for action in message.actions:
-                action.invoke(player, self, message)
+            for parsed in message.actions:
+                parsed.invoke(player, self, message)
 
     def name_to_player(self, name: str) -> Player | None:
         """Find a player by their name."""
@@ -163,44 +317,41 @@ class Game:
         chatting_rounds: int = self.first_day_speak_rounds if is_first_day else self.day_speak_rounds
         # Chat for x rounds
         for i in range(chatting_rounds):
-            self.add_to_history(f"Chatting round {i + 1} of {chatting_rounds}.")
+            self.add_to_history(f"Chatting round {i + 1} of {chatting_rounds}.", HistoryLevel.DEBUG)
             await self.simulate_chat()
 
-        # output the game history into a file
-        with open("game_history.txt", "w", encoding="utf-8") as f:
-            for entry in self.history:
-                f.write(entry + "\n")
-
-        if is_first_day:
-            return
+        # Push the buffered history to the sinks
+        self.history_log.flush()
 
+    async def voting_phase(self) -> None:
+        self.phase = Phase.VOTE
         self.add_to_all_history("Voting phase is ongoing. Players are voting.")
         self.add_to_history("Voting phase is ongoing. Players are voting.")
-        await self.voting_phase()
-        self.add_to_all_history("Voting phase has ended. You may no longer vote.")
-        self.add_to_history("Voting phase has ended. You may no longer vote.")
-        
-        # output the game history into a file
-        with open("game_history.txt", "w", encoding="utf-8") as f:
-            for entry in self.history:
-                f.write(entry + "\n")
 
-    async def voting_phase(self) -> None:
-        self.phase = Phase.VOTE
         # Simulate the voting phase where players vote to lynch someone
         await self.get_votes()
 
+        self.add_to_all_history("Voting phase has ended. You may no longer vote.")
+        self.add_to_history("Voting phase has ended. You may no longer vote.")
+
+        # Push the buffered history to the sinks
+        self.history_log.flush()
+
     async def get_votes(self) -> Player | None:
         self.votes.clear()  # Clear votes
 
         # Collect votes from all alive players
-        for player in self.alive_players:
-            response: PlayerResponse = await player.vote()
-            response = self.parser.parse(response)
-
-            for action in response.actions:
-                if action.name == "VOTE":
-                    action.invoke(player, self, response)
+        if self.concurrent_voting:
+            # Every voter sees the same day log, so all votes can be requested at once.
+            # The tally is applied in seat order afterwards to keep results reproducible.
+            voters: List[Player] = sorted(self.alive_players, key=lambda p: p.index)
+            responses: List[PlayerResponse] = await self.gather_limited([player.vote() for player in voters])
+            for player, response in zip(voters, responses):
+                self.apply_vote(player, response)
+        else:
+            for player in self.alive_players:
+                response: PlayerResponse = await player.vote()
+                self.apply_vote(player, response)
         
         max_votes: int = 0
         voted_out: Player | None = None
@@ -224,35 +375,45 @@ class Game:
         
         self.votes.clear()  # Clear votes for the next round
 
+    def apply_vote(self, player: Player, response: PlayerResponse) -> None:
+        """Parse a player's vote response and apply it to the tally."""
+        response = self.parser.parse(response, player.role, Phase.VOTE)
+
+        for parsed in response.actions:
+            if parsed.name == "VOTE":
+                parsed.invoke(player, self, response)
+
     async def night_phase(self) -> None:
         # Set the phase to night
         self.phase = Phase.NIGHT
         self.add_to_all_history(f"Night {self.day_number} begins!")
         self.add_to_history(f"Night {self.day_number} begins!")
 
-        # Collect actions from all player roles
-        actions: List[tuple[Player, GameAction]] = []
-        for player in self.alive_players:
-            for action in player.role.actions:
-                if action.phase == Phase.NIGHT:
-                    # Add the action to the list
-                    actions.append((player, action))
-        
-        # Execute actions in order of priority
-        actions.sort(key=lambda x: x[1]._priority)
+        # Only players whose role has a night action are asked to act
+        acting_players: List[Player] = [
+            player for player in sorted(self.alive_players, key=lambda p: p.index)
+            if any(action.phase == Phase.NIGHT for action in player.role.actions)
+        ]
 
-        has_gone: List[Player] = []
-        for player, _ in actions:
-            if player in has_gone:
-                continue
-            has_gone.append(player)
+        # Stage 1: collect every night intent at once
+        responses: List[PlayerResponse] = await self.gather_limited([player.night() for player in acting_players])
 
-            response: PlayerResponse = await player.night()
+        intents: List[tuple[Player, ParsedAction, PlayerResponse]] = []
+        for player, response in zip(acting_players, responses):
+            response = self.parser.parse(response, player.role, Phase.NIGHT)
+            for parsed in response.actions:
+                if parsed.phase == Phase.NIGHT:
+                    intents.append((player, parsed, response))
 
-            response = self.parser.parse(response)
-            for action in response.actions:
-                if action.phase == Phase.NIGHT:
-                    action.invoke(player, self, response)
+        # Stage 2: resolve intents in order of priority, ties broken by seat
+        self.resolve_night_intents(intents)
+
+    def resolve_night_intents(self, intents: List[tuple[Player, ParsedAction, PlayerResponse]]) -> None:
+        """Apply parsed night intents deterministically, lowest priority first."""
+        intents.sort(key=lambda intent: (intent[1].action._priority, intent[0].index))
+
+        for player, parsed, response in intents:
+            parsed.invoke(player, self, response)
 
     def player_attack(self, attacker: Player, target: Player) -> None:
         """
@@ -275,7 +436,7 @@ class Game:
         if target_power.value[0] > attacker_power.value[0]:
             attacker.add_to_history(f"Attack on {target.name} was blocked.")
             target.add_to_history(f"You were attacked but your defense blocked it.")
-            self.add_to_history(f"{attacker.name}'s attack on {target.name} was blocked by {target.role.name}'s defense.")
+            self.add_to_history(f"{attacker.name}'s attack on {target.name} was blocked by {target.role.name}'s defense.", HistoryLevel.DEBUG)
             return
         
         # Check if the target is protected by a Doctor
@@ -283,14 +444,14 @@ class Game:
         if any(doctor.role.is_protecting(target) for doctor in doctors):
             attacker.add_to_history(f"Attack on {target.name} was blocked.")
             target.add_to_history(f"You were attacked but a Doctor saved you.")
-            self.add_to_history(f"{attacker.name}'s attack on {target.name} was blocked by a Doctor's protection.")
+            self.add_to_history(f"{attacker.name}'s attack on {target.name} was blocked by a Doctor's protection.", HistoryLevel.DEBUG)
             return
 
 
 
         # If the attack is successful, mark the target as dead
         target.add_to_history(f"You were attacked and died.")
-        self.add_to_history(f"{attacker.name} attacked {target.name} with {attacker_power.name} power.")
+        self.add_to_history(f"{attacker.name} attacked {target.name} with {attacker_power.name} power.", HistoryLevel.DEBUG)
         self.on_player_killed(target)
         self.dead_to_announce.append(target)
 
@@ -303,6 +464,58 @@ class Game:
         if player not in self.dead_players:
             self.dead_players.append(player)
 
+        self.roster.invalidate()
+
+    def get_state(self) -> dict:
+        """Snapshot of everything needed to continue the game, see game/checkpoint.py."""
+        return {
+            "game_id": self.game_id,
+            "seed": self.seed,
+            "rng_state": self.rng.getstate(),
+            "model_name": self.model_name,
+            "player_count": self.player_count,
+            "roles": [role.name for role in self.roles],
+            "first_day_speak_rounds": self.first_day_speak_rounds,
+            "day_speak_rounds": self.day_speak_rounds,
+            "day_number": self.day_number,
+            "phase": self.phase.name,
+            "next_step": self.next_step,
+            "history": self.history,
+            "history_offsets": self.history_log.offsets(),
+            "events": self.event_log.get_state(),
+            "dead_to_announce": [player.index for player in self.dead_to_announce],
+            "players": [player.get_state() for player in self.players],
+        }
+
+    def load_state(self, state: dict) -> None:
+        """Restore a snapshot taken by get_state on a game built with the same seed and roles."""
+        for player, player_state in zip(self.players, state["players"]):
+            if player.name != player_state["name"] or player.role.name != player_state["role"]:
+                raise ValueError(f"Checkpoint does not match the rebuilt game: expected {player_state['name']} "
+                                 f"({player_state['role']}), got {player.name} ({player.role.name}).")
+
+        version, internal_state, gauss = state["rng_state"]
+        self.rng.setstate((version, tuple(internal_state), gauss))
+        self.game_id = state["game_id"]
+        self.first_day_speak_rounds = state["first_day_speak_rounds"]
+        self.day_speak_rounds = state["day_speak_rounds"]
+        self.day_number = state["day_number"]
+        self.phase = Phase[state["phase"]]
+        self.next_step = state["next_step"]
+        self.history = state["history"]
+        self.history_log.count = len(self.history)
+        self.history_log.resume(state["history_offsets"])
+        self.event_log.load_state(state["events"])
+        self.votes = {}
+
+        for player, player_state in zip(self.players, state["players"]):
+            player.load_state(player_state)
+
+        self.alive_players = [player for player in self.players if player.is_alive()]
+        self.dead_players = [player for player in self.players if not player.is_alive()]
+        self.dead_to_announce = [self.players[index - 1] for index in state["dead_to_announce"]]
+        self.roster.invalidate()
+
     def is_game_over(self) -> bool:
         # Check if all Mafia members are dead
         mafia_alive = any(p.role.alignment == RoleAlignment.MAFIA for p in self.alive_players)
@@ -318,17 +531,20 @@ class Game:
 
         return not mafia_alive or not town_alive
 
+    def get_winner(self) -> RoleAlignment:
+        """The winning alignment, the Mafia wins as long as any of its members is alive."""
+        mafia_alive = [p for p in self.alive_players if p.role.alignment == RoleAlignment.MAFIA]
+        return RoleAlignment.MAFIA if mafia_alive else RoleAlignment.TOWN
+
     def print_winner(self) -> None:
-        mafia_alive = [p for p in self.alive_players if p.role.alignment == 'mafia']
-        if mafia_alive:
+        self.winner = self.get_winner()
+        if self.winner == RoleAlignment.MAFIA:
             self.add_to_history("Mafia wins!")
         else:
             self.add_to_history("Town wins!")
 
-        # output the game history into a file
-        with open("game_history.txt", "w", encoding="utf-8") as f:
-            for entry in self.history:
-                f.write(entry + "\n")
+        # Push the buffered history to the sinks
+        self.history_log.flush()
 
 
 def parse_speak_action(player: Player, game: Game, content: str, response: PlayerResponse) -> None:
@@ -338,7 +554,7 @@ def parse_speak_action(player: Player, game: Game, content: str, response: Playe
     """
     
     # Content is the text inside <SPEAK> tags
-    game.add_to_all_history(f"{player.name}: {content}")
+    game.event_log.add(EventType.SPEECH, content, speaker=player.index)
     game.add_to_history(f"{player.name}: {content}")
 
 def parse_vote_action(player: Player, game: Game, content: str, response: PlayerResponse) -> None:
@@ -351,16 +567,16 @@ def parse_vote_action(player: Player, game: Game, content: str, response: Player
     target_name = content.strip()
     target_player = game.name_to_player(target_name)
     if not target_player:
-        game.add_to_all_history(f"{player.name} has abstained from voting.")
+        game.event_log.add(EventType.VOTE, None, speaker=player.index)
         game.add_to_history(f"{player.name} has abstained from voting.")
         return None
     
     if target_player.status != PlayerStatus.ALIVE:
-        game.add_to_all_history(f"{player.name} has abstained from voting.")
+        game.event_log.add(EventType.VOTE, None, speaker=player.index)
         game.add_to_history(f"{player.name} has abstained from voting.")
         return None
     
-    game.add_to_all_history(f"{player.name} voted to lynch {target_player.name}.")
+    game.event_log.add(EventType.VOTE, target_player.index, speaker=player.index)
     game.add_to_history(f"{player.name} voted to lynch {target_player.name}.")
     if target_player.name in game.votes:
         game.votes[target_player.name] += 1
@@ -0,0 +1,124 @@
+# event_log.py
+# One append-only log of everything the players are told. Players keep cursors into it instead of their own
+# copies of every message, so memory grows with the number of events rather than events x players.
+from enum import Enum
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.engine import Game
+    from game.player import Player
+
+
+class EventType(Enum):
+    ANNOUNCEMENT = 1, "announcement"  # Game master message, payload is the text
+    SPEECH = 2, "speech"              # A player talking during the day, payload is what they said
+    VOTE = 3, "vote"                  # A lynch vote, payload is the target's index or None to abstain
+    PRIVATE = 4, "private"            # Game master message to a single player, payload is the text
+
+
+# Visibility mask with every player's bit set
+EVERYONE: int = -1
+# Speaker index of the game master, players are numbered from 1
+GAME_MASTER: int = 0
+
+
+class Event:
+    __slots__ = ("speaker", "type", "payload", "visibility", "_text")
+
+    def __init__(self, speaker: int, type: EventType, payload: str | int | None, visibility: int = EVERYONE):
+        self.speaker: int = speaker
+        self.type: EventType = type
+        self.payload: str | int | None = payload
+        # Bit n is set when player n can see the event
+        self.visibility: int = visibility
+        # Rendered on first use, then shared by every player who sees the event
+        self._text: str | None = None
+
+
+class EventLog:
+    def __init__(self, game: 'Game'):
+        self._game: 'Game' = game
+        self.events: list[Event] = []
+        # Player index -> position of the latest event only some players see, including this one
+        self._last_private: dict[int, int] = {}
+        # Start cursor -> (events scanned so far, rendered public messages), shared by every player on that cursor
+        self._public: dict[int, tuple[int, list[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def add(self, type: EventType, payload: str | int | None, speaker: int = GAME_MASTER, visibility: int = EVERYONE) -> Event:
+        event: Event = Event(speaker, type, payload, visibility)
+        self.events.append(event)
+        if visibility != EVERYONE:
+            self._note_private(len(self.events) - 1, visibility)
+        return event
+
+    def _note_private(self, position: int, visibility: int) -> None:
+        if visibility & (visibility - 1) == 0:
+            # A single player's event, the common case
+            self._last_private[visibility.bit_length() - 1] = position
+            return
+        for player in self._game.players:
+            if visibility & (1 << player.index):
+                self._last_private[player.index] = position
+
+    def announce(self, message: str) -> Event:
+        """A game master message every player sees."""
+        return self.add(EventType.ANNOUNCEMENT, message)
+
+    def tell(self, player: 'Player', message: str) -> Event:
+        """A game master message only the given player sees."""
+        return self.add(EventType.PRIVATE, message, visibility=1 << player.index)
+
+    def render(self, event: Event) -> str:
+        if event._text is None:
+            if event.type == EventType.SPEECH:
+                event._text = f"{self._player(event.speaker).name}: {event.payload}"
+            elif event.type == EventType.VOTE:
+                voter: str = self._player(event.speaker).name
+                if event.payload is None:
+                    event._text = f"{voter} has abstained from voting."
+                else:
+                    event._text = f"{voter} voted to lynch {self._player(event.payload).name}."
+            else:
+                event._text = event.payload
+        return event._text
+
+    def visible_to(self, player: 'Player', start: int = 0) -> list[str]:
+        """Rendered messages the player can see, from the start cursor on."""
+        if self._last_private.get(player.index, -1) < start:
+            # Nothing private since the cursor, the player sees the same messages as everyone on it
+            return list(self._public_since(start))
+
+        bit: int = 1 << player.index
+        lines: list[str] = []
+        for event in self.events[start:]:
+            if event.visibility == EVERYONE or event.visibility & bit:
+                lines.append(event._text if event._text is not None else self.render(event))
+        return lines
+
+    def _public_since(self, start: int) -> list[str]:
+        scanned, lines = self._public.get(start, (start, []))
+        if scanned == start and start not in self._public:
+            # A new cursor, players only move forward so older ones are done with
+            self._public = {cursor: view for cursor, view in self._public.items() if cursor > start}
+        for event in self.events[scanned:]:
+            if event.visibility == EVERYONE:
+                lines.append(event._text if event._text is not None else self.render(event))
+        self._public[start] = (len(self.events), lines)
+        return lines
+
+    def _player(self, index: int) -> 'Player':
+        return self._game.players[index - 1]
+
+    def get_state(self) -> list[list]:
+        return [[event.speaker, event.type.name, event.payload, event.visibility] for event in self.events]
+
+    def load_state(self, state: list[list]) -> None:
+        self.events = [Event(speaker, EventType[type], payload, visibility) for speaker, type, payload, visibility in state]
+        self._last_private = {}
+        self._public = {}
+        for position, event in enumerate(self.events):
+            if event.visibility != EVERYONE:
+                self._note_private(position, event.visibility)
@@ -0,0 +1,88 @@
+# generation.py
+# Per-action generation limits. A vote or a night target only needs a few tokens, so every call gets
+# a token cap, a temperature and stop sequences from the actions it expects instead of an unbounded budget.
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.parser import GameAction
+    from game.roles.base import Role
+
+
+class GenerationProfile:
+    def __init__(self, num_predict: int | None = None, temperature: float | None = None, stop_at_closing_tag: bool = True):
+        # Maximum number of generated tokens, None leaves Ollama's default
+        self.num_predict: int | None = num_predict
+        self.temperature: float | None = temperature
+        # Stop generating as soon as the action's closing tag is produced
+        self.stop_at_closing_tag: bool = stop_at_closing_tag
+
+    def __repr__(self):
+        return f"<GenerationProfile num_predict={self.num_predict} temperature={self.temperature}>"
+
+
+# Reasoning before the tag is allowed, so even the short decisions get some room
+DEFAULT_PROFILES: dict[str, GenerationProfile] = {
+    "SPEAK": GenerationProfile(num_predict=256, temperature=0.9),
+    "VOTE": GenerationProfile(num_predict=128, temperature=0.6),
+    "KILL": GenerationProfile(num_predict=128, temperature=0.6),
+    "VOTEKILL": GenerationProfile(num_predict=128, temperature=0.6),
+    "HEAL": GenerationProfile(num_predict=128, temperature=0.6),
+    "INTERROGATE": GenerationProfile(num_predict=128, temperature=0.6),
+}
+
+
+def closing_tag(action: 'GameAction') -> str:
+    return f"</{action.name}>"
+
+
+def find_profile(action: 'GameAction', profiles: dict[str, GenerationProfile], role: 'Role | None') -> GenerationProfile | None:
+    profile: GenerationProfile | None = role.generation_profiles.get(action.name) if role is not None else None
+    return profile if profile is not None else profiles.get(action.name)
+
+
+def generation_options(actions: list['GameAction'] | None, profiles: dict[str, GenerationProfile],
+                       role: 'Role | None' = None) -> dict:
+    """
+    Ollama options for a call expecting the given actions, the role's own profiles win over the game's.
+    The call is only capped when every action has a profile, and only stops at a closing tag when it expects
+    a single action, so a second tag is never cut off.
+    """
+    if not actions:
+        return {}
+    if len(actions) == 1:
+        # The usual case, one expected action
+        action: 'GameAction' = actions[0]
+        profile: GenerationProfile | None = find_profile(action, profiles, role)
+        if profile is None:
+            return {}
+        options: dict = {}
+        if profile.num_predict is not None:
+            options["num_predict"] = profile.num_predict
+        if profile.temperature is not None:
+            options["temperature"] = profile.temperature
+        if profile.stop_at_closing_tag:
+            options["stop"] = [closing_tag(action)]
+        return options
+
+    found: list[GenerationProfile] = [profile for profile in (find_profile(action, profiles, role) for action in actions) if profile]
+
+    options = {}
+    caps: list[int] = [profile.num_predict for profile in found if profile.num_predict is not None]
+    if len(caps) == len(actions):
+        options["num_predict"] = max(caps)
+    temperatures: list[float] = [profile.temperature for profile in found if profile.temperature is not None]
+    if temperatures:
+        options["temperature"] = max(temperatures)
+    return options
+
+
+def repair_closing_tags(content: str, actions: list['GameAction'] | None) -> str:
+    """
+    Ollama leaves the stop sequence out of the response, so an answer cut at its closing tag ends with an
+    open tag. Close the last action tag left open so the parser still finds it.
+    """
+    for action in actions or []:
+        opening: str = f"<{action.name}>"
+        start: int = content.rfind(opening)
+        if start != -1 and content.find(closing_tag(action), start) == -1:
+            return content + closing_tag(action)
+    return content
@@ -0,0 +1,172 @@
+# history.py
+# Game history pipeline. Every event is streamed to a list of sinks (stdout, text file, JSONL)
+# with buffered appends, so writing the history costs O(events) for the whole game.
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from enum import Enum
+
+
+class HistoryLevel(Enum):
+    DEBUG = 1, "debug"   # Game master details, e.g. night actions and blocked attacks
+    INFO = 2, "info"     # Public game events
+
+
+class HistoryEvent:
+    __slots__ = ("index", "day", "level", "message", "timestamp")
+
+    def __init__(self, index: int, day: int, level: HistoryLevel, message: str):
+        self.index: int = index
+        self.day: int = day
+        self.level: HistoryLevel = level
+        self.message: str = message
+        self.timestamp: float = time.time()
+
+
+class HistorySink(ABC):
+    """Base class for history sinks. Events below the sink's level are ignored."""
+
+    def __init__(self, level: HistoryLevel = HistoryLevel.DEBUG):
+        self.level: HistoryLevel = level
+
+    def accepts(self, event: HistoryEvent) -> bool:
+        return event.level.value[0] >= self.level.value[0]
+
+    @abstractmethod
+    def write(self, event: HistoryEvent) -> None:
+        """Take an accepted event, a sink may hold it until flush."""
+        ...
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class StdoutHistorySink(HistorySink):
+    """Echoes events to stdout."""
+
+    def write(self, event: HistoryEvent) -> None:
+        print(event.message)
+
+
+class BufferedFileHistorySink(HistorySink):
+    """Buffers formatted lines and appends them to a file on flush. The file is truncated on first use unless append is set."""
+
+    def __init__(self, path: str, level: HistoryLevel = HistoryLevel.DEBUG, append: bool = False):
+        super().__init__(level)
+        self.path: str = path
+        self.append: bool = append
+        self.buffer: list[str] = []
+        self.file = None
+
+    @abstractmethod
+    def format(self, event: HistoryEvent) -> str:
+        """The event as a line of the file, newline included."""
+        ...
+
+    def write(self, event: HistoryEvent) -> None:
+        self.buffer.append(self.format(event))
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = open(self.path, "a" if self.append else "w", encoding="utf-8")
+        self.file.write("".join(self.buffer))
+        self.file.flush()
+        self.buffer.clear()
+
+    def tell(self) -> int:
+        """Bytes in the file once the buffered lines are written."""
+        self.flush()
+        if self.file is not None:
+            return self.file.tell()
+        return os.path.getsize(self.path) if self.append and os.path.exists(self.path) else 0
+
+    def resume(self, size: int) -> None:
+        """Continue a file written up to size bytes, dropping what was written after that."""
+        self.append = True
+        if os.path.exists(self.path) and os.path.getsize(self.path) > size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+
+    def close(self) -> None:
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TextHistorySink(BufferedFileHistorySink):
+    """Plain text history, one message per line (the classic game_history.txt)."""
+
+    def __init__(self, path: str = "game_history.txt", level: HistoryLevel = HistoryLevel.DEBUG, append: bool = False):
+        super().__init__(path, level, append)
+
+    def format(self, event: HistoryEvent) -> str:
+        return event.message + "\n"
+
+
+class JsonlHistorySink(BufferedFileHistorySink):
+    """Structured history, one JSON object per line."""
+
+    def __init__(self, path: str = "game_history.jsonl", level: HistoryLevel = HistoryLevel.DEBUG, append: bool = False):
+        super().__init__(path, level, append)
+
+    def format(self, event: HistoryEvent) -> str:
+        return json.dumps({
+            "index": event.index,
+            "day": event.day,
+            "level": event.level.value[1],
+            "message": event.message,
+            "timestamp": event.timestamp,
+        }) + "\n"
+
+
+class GameHistory:
+    def __init__(self, sinks: list[HistorySink], flush_every: int = 64, flush_interval: float = 5.0):
+        self.sinks: list[HistorySink] = sinks
+        self.flush_every: int = flush_every
+        self.flush_interval: float = flush_interval
+        self.count: int = 0
+        self._pending: int = 0
+        self._last_flush: float = time.monotonic()
+
+    def add(self, message: str, day: int = 0, level: HistoryLevel = HistoryLevel.INFO) -> None:
+        """Stream an event to every sink that accepts its level."""
+        event = HistoryEvent(self.count, day, level, message)
+        self.count += 1
+        for sink in self.sinks:
+            if sink.accepts(event):
+                sink.write(event)
+
+        # Flush periodically so a crash loses at most a few events
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def offsets(self) -> dict[str, int]:
+        """How far each history file is written, for checkpoints."""
+        return {sink.path: sink.tell() for sink in self.sinks if isinstance(sink, BufferedFileHistorySink)}
+
+    def resume(self, offsets: dict[str, int]) -> None:
+        """
+        Cut the history files back to where a checkpoint left them, so the events of the phase that was
+        interrupted aren't in the file twice once it is played again.
+        """
+        for sink in self.sinks:
+            if isinstance(sink, BufferedFileHistorySink) and sink.path in offsets:
+                sink.resume(offsets[sink.path])
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
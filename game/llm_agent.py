@@ -1,43 +1,165 @@
 # LLM agent wrapper for player AI
-from ollama import AsyncClient
+import time
+from game.backends.base import LLMBackend, LLMRequest, LLMResult
+from game.backends.ollama import OllamaBackend
+from game.debug_capture import debug_capture
+from game.generation import generation_options, repair_closing_tags
+from game.metrics import CallRecord
+from game.prompt import common_prefix_of_parts
+from game.session import Session
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from game.player import Player
     from game.roles.mayor import Mayor
-    from game.parser import PlayerResponse
+    from game.parser import GameAction, PlayerResponse
+    from game.phase import Phase
 
 reference_num: int = 0
+# Prefix lengths are measured to within this many characters, a few tokens, which is plenty for a ratio
+PREFIX_RESOLUTION: int = 32
 
 class LLMAgent:
     # nemotron-mini:4b
     # gemma3:4b
-    def __init__(self, player: 'Player', model_name: str = "gemma3:4b", system_prompt: str = "", ):
+    def __init__(self, player: 'Player', model_name: str = "gemma3:4b", system_prompt: str = "", backend: LLMBackend | None = None):
         self.model_name: str = model_name
         self.system_prompt: str = system_prompt
         self.player: 'Player' = player
-        self.client: AsyncClient = AsyncClient()
+        self.backend: LLMBackend = backend if backend is not None else OllamaBackend()
+        # Earlier turns of this player's conversation, only used when the game runs in session mode
+        self.session: Session = Session()
+        # Parts of this player's previous call, see prefix_length
+        self.last_parts: list[str] = []
 
-    async def chat(self, player_prompt: str) -> 'PlayerResponse':
+    async def chat(self, player_prompt: str, phase: 'Phase | None' = None, actions: list['GameAction'] | None = None,
+                   num_ctx: int = 8192, sections: list[str] | None = None) -> 'PlayerResponse':
+        """
+        Send the prompt to the model, after the player's earlier turns in session mode. sections are the
+        pieces the prompt was joined from, they only make measuring the reused prefix cheaper.
+        """
         global reference_num
         # save the prompt for debugging
-        _reference_num: str = self.player.name + "_" + str(reference_num)
+        _reference_num: int = reference_num
         reference_num += 1
-        with open(f"prompts/debug_prompt_{_reference_num}.txt", "w", encoding="utf-8") as f:
-            f.write(self.system_prompt + "\n" + player_prompt)
-        
-        response = await self.client.chat(
+        capture: bool = debug_capture.sample()
+        if capture:
+            _reference: str = self.player.name + "_" + str(_reference_num)
+            debug_capture.capture_prompt(_reference, self.system_prompt + "\n" + player_prompt)
+
+        sessions: bool = self.player._game.sessions
+        request: LLMRequest = LLMRequest(
             model=self.model_name,
             messages=[
                 {"role": "system", "content": self.system_prompt},
+                *(self.session.messages if sessions else []),
                 {"role": "user", "content": player_prompt}
             ],
-            options={"num_ctx": 8192}  # Set context window to 8192 tokens (adjust as needed)
+            options={
+                "num_ctx": num_ctx,  # Context window, the game's current size, see Player.finish_prompt
+                **generation_options(actions, self.player._game.generation_profiles, self.player.role),
+            },
+            phase=phase,
+            actions=actions,
+            player=self.player,
+            keep_alive=self.player._game.keep_alive,
+            metrics=self.player._game.metrics,
         )
+        started: float = time.perf_counter()
+        result: LLMResult = await self.chat_with_deadline(request)
+        # In session mode the earlier turns are the shared part, compared as whole messages
+        parts: list[str] = [message["content"] for message in request.messages[:-1]]
+        parts.extend(sections if sections and not sessions else [player_prompt])
+        self.record_metrics(request, result, time.perf_counter() - started, parts)
+
+        if "stop" in request.options and result.done_reason == "stop":
+            # Only an answer that ended on its stop sequence lost its closing tag, one cut off by num_predict
+            # stays open so the parser rejects it instead of taking a half sentence for the whole speech
+            result.content = repair_closing_tags(result.content, actions)
+        if sessions:
+            self.session.end_turn(player_prompt, result.content)
+
         from game.parser import PlayerResponse
-        llm_response = PlayerResponse(response['message']['content'])
+        llm_response = PlayerResponse(result.content)
 
-        with open(f"response/debug_response_{_reference_num}.txt", "w", encoding="utf-8") as f:
-            f.write(response['message']['content'])
+        if capture:
+            debug_capture.capture_response(_reference, result.content)
 
         return llm_response
+
+    async def chat_with_deadline(self, request: LLMRequest) -> LLMResult:
+        """
+        Call the backend, cancelling every attempt that outlives the phase's deadline. After the last retry
+        the phase's fallback response stands in for the model's, so a stalled model can't hold up the game.
+        When too many calls in a row fall back the model is taken as stalled and TimeoutError ends the game.
+        """
+        game = self.player._game
+        phase = request.phase if request.phase is not None else game.phase
+        timeout: float | None = game.call_timeouts.get(phase)
+        if timeout is None:
+            return await self.backend.chat(request)
+
+        attempts: int = 1 + max(0, game.call_retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                result: LLMResult = await game.deadlines.run(self.backend.chat(request), timeout)
+                game.consecutive_fallbacks = 0
+                return result
+            except TimeoutError:
+                from game.history import HistoryLevel
+                game.metrics.increment("llm_timeouts")
+                game.add_to_history(f"{self.player.name}'s {phase.value[1]} call timed out after {timeout}s "
+                                    f"(attempt {attempt} of {attempts}).", HistoryLevel.DEBUG)
+
+        game.metrics.increment("llm_timeout_fallbacks")
+        game.consecutive_fallbacks += 1
+        if game.max_consecutive_fallbacks is not None and game.consecutive_fallbacks >= game.max_consecutive_fallbacks:
+            raise TimeoutError(f"The last {game.consecutive_fallbacks} LLM calls all timed out, "
+                               f"the model seems to have stalled.")
+        return LLMResult(content=game.timeout_fallbacks.get(phase, ""))
+
+    def prefix_length(self, parts: list[str], num_ctx: int) -> int:
+        """
+        How much of the call's text matches the start of a call the server has just seen, either this player's
+        previous one or the last one of the game, which is roughly what its prompt cache can skip.
+        Nothing is reused when num_ctx changed since the last call, Ollama reloads the model and its cache.
+        """
+        game = self.player._game
+        if num_ctx != game.last_num_ctx:
+            game.last_num_ctx = num_ctx
+            self.last_parts = parts
+            game.last_parts = parts
+            return 0
+        length: int = common_prefix_of_parts(parts, self.last_parts, PREFIX_RESOLUTION)
+        other: list[str] = game.last_parts
+        # A call with another system prompt can't share more than the player's own previous call did
+        if other is not self.last_parts and other and (other[0] == parts[0] or length < len(parts[0])):
+            length = max(length, common_prefix_of_parts(parts, other, PREFIX_RESOLUTION))
+        self.last_parts = parts
+        game.last_parts = parts
+        return length
+
+    def record_metrics(self, request: LLMRequest, result: LLMResult, wall_seconds: float, parts: list[str]) -> None:
+        """Record the call's latency and token counts, tagged with where in the game it happened."""
+        game = self.player._game
+        phase = request.phase if request.phase is not None else game.phase
+        num_ctx: int = request.options.get("num_ctx", 0)
+        prefix_chars: int = self.prefix_length(parts, num_ctx)
+        game.metrics.record_call(CallRecord(
+            game_id=game.game_id,
+            day=game.day_number,
+            phase=phase.value[1],
+            player=self.player.name,
+            role=self.player.role.name,
+            model=request.model,
+            num_ctx=num_ctx,
+            prompt_chars=sum(len(part) for part in parts),
+            prefix_chars=prefix_chars,
+            wall_seconds=wall_seconds,
+            prompt_eval_count=result.prompt_eval_count,
+            eval_count=result.eval_count,
+            total_duration=result.total_duration,
+            load_duration=result.load_duration,
+            prompt_eval_duration=result.prompt_eval_duration,
+            eval_duration=result.eval_duration,
+        ))
@@ -0,0 +1,70 @@
+# llm_client.py
+# Process-wide registry of pooled Ollama clients shared by every LLMAgent.
+import asyncio
+import httpx
+from ollama import AsyncClient
+
+
+class ClientRegistry:
+    def __init__(self, pool_size: int = 32, keepalive_connections: int = 16, keepalive_expiry: float = 60.0,
+                 connect_timeout: float = 10.0, read_timeout: float | None = None) -> None:
+        # Clients are keyed by host and event loop, httpx pools can't be shared across loops
+        self.clients: dict[tuple[str | None, int], AsyncClient] = {}
+        self.users: int = 0
+        self.configure(pool_size=pool_size, keepalive_connections=keepalive_connections,
+                       keepalive_expiry=keepalive_expiry, connect_timeout=connect_timeout,
+                       read_timeout=read_timeout)
+
+    def configure(self, pool_size: int | None = None, keepalive_connections: int | None = None,
+                  keepalive_expiry: float | None = None, connect_timeout: float | None = None,
+                  read_timeout: float | None = ...) -> None:
+        """Change the pool settings. Only clients created afterwards are affected."""
+        if pool_size is not None:
+            self.pool_size: int = pool_size
+        if keepalive_connections is not None:
+            self.keepalive_connections: int = keepalive_connections
+        if keepalive_expiry is not None:
+            self.keepalive_expiry: float = keepalive_expiry
+        if connect_timeout is not None:
+            self.connect_timeout: float = connect_timeout
+        if read_timeout is not ...:
+            # None means generations may take as long as they need
+            self.read_timeout: float | None = read_timeout
+
+    def get(self, host: str | None = None) -> AsyncClient:
+        """Get the shared client for a host, creating it on first use."""
+        key = (host, id(asyncio.get_running_loop()))
+        client = self.clients.get(key)
+        if client is None:
+            client = AsyncClient(
+                host=host,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self.clients[key] = client
+        return client
+
+    def acquire(self) -> None:
+        """Register a user (usually a running game) of the shared clients."""
+        self.users += 1
+
+    async def release(self) -> None:
+        """Unregister a user and close the clients once nobody uses them anymore."""
+        self.users = max(0, self.users - 1)
+        if self.users == 0:
+            await self.close()
+
+    async def close(self) -> None:
+        """Close every client owned by the current event loop."""
+        loop_id = id(asyncio.get_running_loop())
+        for key in [key for key in self.clients if key[1] == loop_id]:
+            client = self.clients.pop(key)
+            await client.close()
+
+
+# Shared by every agent in the process
+client_registry: ClientRegistry = ClientRegistry()
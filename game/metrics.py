@@ -0,0 +1,208 @@
+# metrics.py
+# Per-call LLM latency and token metrics, aggregated into percentiles and exported as JSON or Prometheus text.
+import json
+import math
+
+
+class CallRecord:
+    __slots__ = ("game_id", "day", "phase", "player", "role", "model", "num_ctx", "prompt_chars", "prefix_chars", "wall_seconds",
+                 "prompt_eval_count", "eval_count", "total_duration", "load_duration",
+                 "prompt_eval_duration", "eval_duration")
+
+    def __init__(self, game_id: str, day: int, phase: str, player: str, role: str, model: str, wall_seconds: float,
+                 num_ctx: int = 0, prompt_chars: int = 0, prefix_chars: int = 0, prompt_eval_count: int = 0, eval_count: int = 0, total_duration: int = 0, load_duration: int = 0,
+                 prompt_eval_duration: int = 0, eval_duration: int = 0):
+        self.game_id: str = game_id
+        self.day: int = day
+        self.phase: str = phase
+        self.player: str = player
+        self.role: str = role
+        self.model: str = model
+        # Context window the call was sent with
+        self.num_ctx: int = num_ctx
+        # Length of the system and user prompt, and how much of it matched the start of a recent prompt
+        self.prompt_chars: int = prompt_chars
+        self.prefix_chars: int = prefix_chars
+        self.wall_seconds: float = wall_seconds
+        # Durations are in nanoseconds, as reported by Ollama
+        self.prompt_eval_count: int = prompt_eval_count
+        self.eval_count: int = eval_count
+        self.total_duration: int = total_duration
+        self.load_duration: int = load_duration
+        self.prompt_eval_duration: int = prompt_eval_duration
+        self.eval_duration: int = eval_duration
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, q between 0 and 100."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def tokens_per_second(tokens: int, duration_ns: int) -> float:
+    return tokens / (duration_ns / 1e9) if duration_ns > 0 else 0.0
+
+
+def prefix_reuse(records: list[CallRecord]) -> float:
+    """Share of the prompt text that repeats the start of a recent prompt, what the layout allows to be cached."""
+    prompt_chars: int = sum(r.prompt_chars for r in records)
+    return sum(r.prefix_chars for r in records) / prompt_chars if prompt_chars else 0.0
+
+
+def prompt_cache_hit_ratio(records: list[CallRecord]) -> float:
+    """
+    Share of the prompt tokens the server didn't have to evaluate, as it only counts the uncached ones.
+    The prompt sizes are estimated from their length, so this is approximate. 0 when the server reports nothing.
+    """
+    from game.prompt import CHARS_PER_TOKEN
+    measured: list[CallRecord] = [r for r in records if r.prompt_eval_count and r.prompt_chars]
+    if not measured:
+        return 0.0
+    estimated_tokens: float = sum(r.prompt_chars for r in measured) / CHARS_PER_TOKEN
+    evaluated: int = sum(r.prompt_eval_count for r in measured)
+    return min(1.0, max(0.0, 1 - evaluated / estimated_tokens))
+
+
+class MetricsRecorder:
+    QUANTILES: tuple[int, ...] = (50, 95, 99)
+
+    def __init__(self):
+        self.records: list[CallRecord] = []
+        # Named event counters, e.g. timeouts or cache hits
+        self.counters: dict[str, int] = {}
+        # Model -> seconds each game start spent loading it, kept apart from the calls
+        self.preloads: dict[str, list[float]] = {}
+
+    def record_call(self, record: CallRecord) -> None:
+        self.records.append(record)
+
+    def record_preload(self, model: str, seconds: float) -> None:
+        self.preloads.setdefault(model, []).append(seconds)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.counters.clear()
+        self.preloads.clear()
+
+    def group(self, key: str) -> dict[str, list[CallRecord]]:
+        """Group the records by one of their tags, e.g. "phase" or "role"."""
+        groups: dict[str, list[CallRecord]] = {}
+        for record in self.records:
+            groups.setdefault(str(getattr(record, key)), []).append(record)
+        return groups
+
+    def summarize(self, records: list[CallRecord]) -> dict:
+        """Latency percentiles, token totals and throughput for a list of records."""
+        summary: dict = {"calls": len(records)}
+        series: dict[str, list[float]] = {
+            "wall_seconds": [r.wall_seconds for r in records],
+            "prompt_eval_seconds": [r.prompt_eval_duration / 1e9 for r in records],
+            "eval_seconds": [r.eval_duration / 1e9 for r in records],
+            "load_seconds": [r.load_duration / 1e9 for r in records],
+            "prompt_tokens": [r.prompt_eval_count for r in records],
+            "eval_tokens": [r.eval_count for r in records],
+        }
+        for name, values in series.items():
+            summary[name] = {f"p{q}": percentile(values, q) for q in self.QUANTILES}
+            summary[name]["sum"] = sum(values)
+
+        summary["prompt_tokens_per_second"] = tokens_per_second(
+            sum(r.prompt_eval_count for r in records), sum(r.prompt_eval_duration for r in records))
+        summary["eval_tokens_per_second"] = tokens_per_second(
+            sum(r.eval_count for r in records), sum(r.eval_duration for r in records))
+        summary["prefix_reuse"] = prefix_reuse(records)
+        summary["prompt_cache_hit_ratio"] = prompt_cache_hit_ratio(records)
+        return summary
+
+    def report(self) -> dict:
+        """Aggregate report over all calls, per phase, per role and per context window size."""
+        return {
+            "total": self.summarize(self.records),
+            "by_phase": {phase: self.summarize(records) for phase, records in self.group("phase").items()},
+            "by_role": {role: self.summarize(records) for role, records in self.group("role").items()},
+            "by_num_ctx": {size: self.summarize(records) for size, records in sorted(self.group("num_ctx").items(), key=lambda item: int(item[0]))},
+            "preload_seconds": {
+                model: {"count": len(seconds), "max": max(seconds), "sum": sum(seconds)}
+                for model, seconds in sorted(self.preloads.items())
+            },
+            "counters": dict(self.counters),
+        }
+
+    def write_json(self, path: str, include_calls: bool = False) -> None:
+        report: dict = self.report()
+        if include_calls:
+            report["calls"] = [record.to_dict() for record in self.records]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+
+        def summary_metric(name: str, help_text: str, attribute) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for phase, records in sorted(self.group("phase").items()):
+                values = [attribute(r) for r in records]
+                for q in self.QUANTILES:
+                    lines.append(f'{name}{{phase="{phase}",quantile="{q / 100}"}} {percentile(values, q)}')
+                lines.append(f'{name}_sum{{phase="{phase}"}} {sum(values)}')
+                lines.append(f'{name}_count{{phase="{phase}"}} {len(values)}')
+
+        summary_metric("tos_llm_call_seconds", "Wall clock time of LLM calls.", lambda r: r.wall_seconds)
+        summary_metric("tos_llm_prompt_eval_seconds", "Time spent evaluating the prompt.", lambda r: r.prompt_eval_duration / 1e9)
+        summary_metric("tos_llm_eval_seconds", "Time spent generating the response.", lambda r: r.eval_duration / 1e9)
+        summary_metric("tos_llm_load_seconds", "Time spent loading the model.", lambda r: r.load_duration / 1e9)
+
+        for name, help_text, attribute in (
+            ("tos_llm_prompt_tokens_total", "Prompt tokens evaluated.", "prompt_eval_count"),
+            ("tos_llm_eval_tokens_total", "Tokens generated.", "eval_count"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for phase, records in sorted(self.group("phase").items()):
+                lines.append(f'{name}{{phase="{phase}"}} {sum(getattr(r, attribute) for r in records)}')
+
+        lines.append("# HELP tos_llm_eval_tokens_per_second Generation throughput.")
+        lines.append("# TYPE tos_llm_eval_tokens_per_second gauge")
+        for phase, records in sorted(self.group("phase").items()):
+            rate = tokens_per_second(sum(r.eval_count for r in records), sum(r.eval_duration for r in records))
+            lines.append(f'tos_llm_eval_tokens_per_second{{phase="{phase}"}} {rate}')
+
+        for name, help_text, ratio in (
+            ("tos_llm_prefix_reuse_ratio", "Share of prompt text repeating the start of a recent prompt.", prefix_reuse),
+            ("tos_llm_prompt_cache_hit_ratio", "Estimated share of prompt tokens served from the server's cache.", prompt_cache_hit_ratio),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for phase, records in sorted(self.group("phase").items()):
+                lines.append(f'{name}{{phase="{phase}"}} {ratio(records)}')
+
+        lines.append("# HELP tos_llm_preload_seconds Time spent loading models at game start.")
+        lines.append("# TYPE tos_llm_preload_seconds summary")
+        for model, seconds in sorted(self.preloads.items()):
+            lines.append(f'tos_llm_preload_seconds_sum{{model="{model}"}} {sum(seconds)}')
+            lines.append(f'tos_llm_preload_seconds_count{{model="{model}"}} {len(seconds)}')
+
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE tos_{name}_total counter")
+            lines.append(f"tos_{name}_total {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+# Shared by every game in the process unless a game is given its own recorder
+metrics: MetricsRecorder = MetricsRecorder()
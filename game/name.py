@@ -24,7 +24,7 @@ NAMES = [
     "Jan", "Jane", "Janet", "Janice", "Jared", "Jason", "Jean", "Jeff", "Jeffrey", "Jenna", "Jennifer",
     "Jenny", "Jeremiah", "Jeremy", "Jerry", "Jesse", "Jessica", "Jill", "Joan", "Joanna", "Joe",
     "Joel", "John", "Johnny", "Jon", "Jonathan", "Jordan", "Jose", "Joseph", "Josh", "Joshua", "Joy",
-    "Joyce", "Juan", "Judith", "Judy", "Julia", "Julian", "Julie", "Justin", "Kara", "Karen", "Katelyn",
+    "Joyce", "Juan", "Judith", "Judy", "Julia", "Julian", "Julie", "Justin", "Kara", "Katelyn",
     "Kathleen", "Kathy", "Katie", "Kayla", "Keith", "Kelly", "Ken", "Kendra", "Kenneth", "Kevin",
     "Kim", "Kimberly", "Kirk", "Kristen", "Kristin", "Kyle", "Lance", "Larry", "Laura", "Lauren",
     "Laurie", "Leah", "Lee", "Leonard", "Leslie", "Liam", "Linda", "Lindsay", "Lisa", "Logan",
@@ -35,24 +35,24 @@ NAMES = [
     "Monica", "Morgan", "Nancy", "Natalie", "Nathan", "Neil", "Nicholas", "Nicole", "Noah", "Norma",
     "Olivia", "Pam", "Pamela", "Pat", "Patricia", "Patrick", "Pauline", "Peggy", "Penny", "Peter",
     "Phil", "Philip", "Phillip", "Rachel", "Ralph", "Randy", "Ray", "Raymond", "Rebecca", "Regina",
-    "Renee", "Rhonda", "Richard", "Rick", "Rita", "Rob", "Roberta", "Robert", "Robin", "Roger",
+    "Renee", "Rhonda", "Richard", "Rick", "Rob", "Roberta", "Robert", "Robin", "Roger",
     "Ron", "Ronald", "Rose", "Ross", "Roy", "Ruby", "Russell", "Ruth", "Ryan", "Sally", "Sammy",
     "Sandra", "Sara", "Sarah", "Scott", "Sean", "Shane", "Shannon", "Sharon", "Sheila", "Shelby",
     "Sherri", "Sherry", "Shirley", "Sidney", "Sierra", "Sofia", "Sonia", "Sophie", "Spencer", "Stacy",
     "Stanley", "Stephanie", "Stephen", "Steve", "Steven", "Sue", "Summer", "Susan", "Suzanne", "Sydney",
     "Sylvia", "Tammy", "Tanya", "Tara", "Taylor", "Ted", "Teresa", "Terri", "Terry", "Thelma", "Theresa",
-    "Thomas", "Tiffany", "Tim", "Timothy", "Tina", "Todd", "Tom", "Toni", "Tony", "Tracy", "Travis",
+    "Thomas", "Tiffany", "Tim", "Timothy", "Todd", "Tom", "Toni", "Tony", "Tracy", "Travis",
     "Trent", "Trevor", "Troy", "Tyler", "Valerie", "Vanessa", "Vera", "Vernon", "Veronica", "Vicki",
     "Vicky", "Victor", "Victoria", "Vincent", "Virginia", "Vivian", "Wade", "Walter", "Wanda", "Wayne",
     "Wesley", "Will", "William", "Willie", "Yolanda", "Yvonne", "Zach", "Zachary", "Fell"
 ]
 
-def pick_random_name() -> str:
+def pick_random_name(rng: random.Random | None = None) -> str:
     """Return a random name from the NAMES list."""
-    return random.choice(NAMES)
+    return (rng or random).choice(NAMES)
 
-def pick_multiple_names(count: int) -> list[str]:
+def pick_multiple_names(count: int, rng: random.Random | None = None) -> list[str]:
     """Return a list of unique random names from the NAMES list."""
     if count > len(NAMES):
         raise ValueError("Requested more unique names than available in the list.")
-    return random.sample(NAMES, count)
+    return (rng or random).sample(NAMES, count)
@@ -9,21 +9,23 @@ if TYPE_CHECKING:
     from game.roles.base import Role
 
 class GameAction:
+    """
+    Spec of an action: its tag, phase and callback. One instance is shared by every response that uses
+    the tag, so it never holds per-response state, see ParsedAction.
+    """
+
     def __init__(self, name: str, tag: str, phase: str, callback: Callable | None = None):
         self.name: str = name
         self.tag: str = tag
         self.phase: str = phase
-        self._content: str = ""
         self._priority: int = 0  # Default priority, can be set later
         # Callback args: (player, game, content, response)
         self.callback: Callable | None = callback
 
-    def invoke(self, player, game, response) -> None:
+    def invoke(self, player, game, response, content: str) -> None:
         """Invoke the action's callback if it exists."""
         if self.callback:
-            self.callback(player, game, self._content, response)
-        
-        self._content = ""  # Clear content after invoking
+            self.callback(player, game, content, response)
 
     def set_priority(self, priority: int) -> None:
         """Set the priority of the action."""
@@ -32,13 +34,43 @@ class GameAction:
     def __repr__(self):
         return f"<GameAction {self.name} tag={self.tag} phase={self.phase}>"
 
+class ParsedAction:
+    """One action found in a response, with the content of its tag. Immutable, so parses never interfere."""
+    __slots__ = ("_action", "_content")
+
+    def __init__(self, action: GameAction, content: str):
+        self._action: GameAction = action
+        self._content: str = content
+
+    @property
+    def action(self) -> GameAction:
+        return self._action
+
+    @property
+    def content(self) -> str:
+        return self._content
+
+    @property
+    def name(self) -> str:
+        return self._action.name
+
+    @property
+    def phase(self) -> str:
+        return self._action.phase
+
+    def invoke(self, player, game, response) -> None:
+        self._action.invoke(player, game, response, self._content)
+
+    def __repr__(self):
+        return f"<ParsedAction {self.name} content={self._content[:20]!r}>"
+
 class PlayerResponse:
     def __init__(self, raw: str):
         self.raw = raw.strip()
         self.valid: bool = True
-        self.actions: list[GameAction] = []
+        self.actions: list[ParsedAction] = []
     
-    def add_action(self, action: GameAction) -> None:
+    def add_action(self, action: ParsedAction) -> None:
         """Add an action to the response."""
         self.actions.append(action)
 
@@ -49,61 +81,144 @@ class Parser:
     def __init__(self):
         self.registered_actions: list[GameAction] = []
         self.role_specific_actions: dict['Role', list[GameAction]] = {}
+        # Action name -> action, for the general actions only
         self.action_tags: dict[str, GameAction] = {}
+        # Built lazily and dropped whenever an action is registered
+        self._pattern: re.Pattern | None = None
+        self._phase_index: dict[tuple[str | None, 'Role | None'], list[GameAction]] = {}
+        self._dispatch: dict[tuple[str | None, 'Role | None'], dict[str, GameAction]] = {}
     
     def register_action(self, action: GameAction) -> None:
         """Register a new action to be recognized by the parser."""
         self.registered_actions.append(action)
         self.action_tags[action.name] = action
+        self.invalidate()
 
-    def regiser_role_action(self, action: GameAction, role: 'Role') -> None:
+    def register_role_action(self, action: GameAction, role: 'Role') -> None:
         """Register an action for a specific role."""
         if role not in self.role_specific_actions:
             self.role_specific_actions[role] = []
         
         self.role_specific_actions[role].append(action)
-        self.action_tags[action.name] = action
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self._pattern = None
+        self._phase_index.clear()
+        self._dispatch.clear()
+
+    @property
+    def pattern(self) -> re.Pattern:
+        """One matcher for every registered tag, the closing tag has to match the opening one."""
+        if self._pattern is None:
+            names: set[str] = {action.name for action in self.registered_actions}
+            for actions in self.role_specific_actions.values():
+                names.update(action.name for action in actions)
+            # Longest first so a tag is never matched by a shorter name it starts with
+            alternatives: str = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+            # The content may not run into a second opening of the same tag, <VOTE>a</X> <VOTE>b</VOTE> yields b
+            self._pattern = re.compile(rf"<({alternatives})>((?:(?!<\1>).)*?)</\1>", re.DOTALL)
+        return self._pattern
 
     def has_tag(self, tag: str) -> bool:
         """Check if the parser has a registered action with the given tag."""
-        for action in self.registered_actions:
-            if action.name == tag:
-                return True
-        
-        return False
-
-    def parse(self, response: PlayerResponse) -> PlayerResponse:
-        """Parse the response and extract the action."""
+        return tag in self.action_tags
+
+    def dispatch_table(self, phase: str | None = None, role: 'Role | None' = None) -> dict[str, GameAction]:
+        """Tag name -> action a player with this role may use in this phase. Either one may be None for any."""
+        key = (phase, role)
+        table: dict[str, GameAction] | None = self._dispatch.get(key)
+        if table is None:
+            if role is None:
+                actions: list[GameAction] = list(self.registered_actions)
+                for role_actions in self.role_specific_actions.values():
+                    actions.extend(role_actions)
+                if phase is not None:
+                    actions = [action for action in actions if action.phase == phase]
+            else:
+                actions = self.get_phase_actions_for_role(phase, role) if phase is not None else \
+                    self.registered_actions + self.role_specific_actions.get(role, [])
+            # The first action registered under a name wins, general actions before role actions
+            table = {}
+            for action in actions:
+                table.setdefault(action.name, action)
+            self._dispatch[key] = table
+        return table
+
+    def parse(self, response: PlayerResponse, role: 'Role | None' = None, phase: str | None = None) -> PlayerResponse:
+        """
+        Parse the response and extract the actions. With a role and phase, only the tags that role may use
+        in that phase count, anything else in the response is ignored. Only the first tag of each action
+        counts, a player gets one vote or one kill however many tags they write.
+        """
         response_text: str = response.raw
+        table: dict[str, GameAction] = self.dispatch_table(phase, role)
+        seen: set[str] = set()
         
         # Find all tags in the response
         # Example: <KILL>PLAYER_NAME</KILL>
-        tags = re.findall(r'<(\w+)>(.*?)<\/(\w+)>', response_text, re.DOTALL)
-        for tag, content, _ in tags:
-            if tag in self.action_tags:
-                action = self.action_tags[tag]
-                action._content = content.strip()
-
-                response.actions.append(action)
+        for tag, content in self.pattern.findall(response_text):
+            action: GameAction | None = table.get(tag)
+            if action is not None and tag not in seen:
+                seen.add(tag)
+                response.actions.append(ParsedAction(action, content.strip()))
         
         return response
     
     def get_phase_actions(self, phase: str) -> list[GameAction]:
-        """Get all actions registered for a specific phase."""
-        return [action for action in self.registered_actions if action.phase == phase]
+        """Get all actions registered for a specific phase. The list is shared, don't modify it."""
+        key = (phase, None)
+        actions: list[GameAction] | None = self._phase_index.get(key)
+        if actions is None:
+            actions = [action for action in self.registered_actions if action.phase == phase]
+            self._phase_index[key] = actions
+        return actions
     
     def get_phase_actions_for_role(self, phase: str, role: 'Role') -> list[GameAction]:
-        """Get all actions registered for a specific phase and role."""
-        actions: list[GameAction] = []
-
-        # Check for general actions
-        for action in self.get_phase_actions(phase):
-            actions.append(action)
-
-        # Check for role-specific actions
-        if role in self.role_specific_actions:
-            for action in self.role_specific_actions[role]:
-                if action.phase == phase:
-                    actions.append(action)
+        """Get all actions registered for a specific phase and role. The list is shared, don't modify it."""
+        key = (phase, role)
+        actions: list[GameAction] | None = self._phase_index.get(key)
+        if actions is None:
+            # General actions first, then the role's own
+            actions = list(self.get_phase_actions(phase))
+            actions.extend(action for action in self.role_specific_actions.get(role, []) if action.phase == phase)
+            self._phase_index[key] = actions
+        return actions
+
+
+class IncrementalTagParser:
+    """
+    Reads a response as it streams in and notices as soon as one of the expected action tags closes,
+    so the rest of the generation can be skipped. Only the last few characters are rescanned per chunk.
+    """
+
+    def __init__(self, tag_names: list[str]):
+        self.closing_tags: list[str] = [f"</{name}>" for name in tag_names]
+        # A closing tag can be split across chunks, keep enough of the previous text to catch it
+        self._overlap: int = max((len(tag) for tag in self.closing_tags), default=1) - 1
+        self._parts: list[str] = []
+        self._tail: str = ""
+        self.closed_tag: str | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk, True once an expected tag has closed. The text is cut right after that tag."""
+        if self.closed_tag is not None:
+            return True
+
+        window: str = self._tail + chunk
+        for tag in self.closing_tags:
+            position: int = window.find(tag)
+            if position != -1:
+                self.closed_tag = tag
+                # Drop whatever the model said after the tag
+                end: int = position + len(tag) - len(self._tail)
+                self._parts.append(chunk[:end])
+                return True
 
-        return actions
\ No newline at end of file
+        self._parts.append(chunk)
+        self._tail = window[-self._overlap:] if self._overlap else ""
+        return False
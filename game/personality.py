@@ -129,11 +129,11 @@ PERSONALITY_TRAITS = [
     "zealous"
 ]
 
-def pick_random_personality() -> str:
-    return random.choice(PERSONALITY_TRAITS)
+def pick_random_personality(rng: random.Random | None = None) -> str:
+    return (rng or random).choice(PERSONALITY_TRAITS)
 
-def pick_multiple_personalities(n) -> list[str]:
+def pick_multiple_personalities(n, rng: random.Random | None = None) -> list[str]:
     """Return a list of n unique random personality traits."""
     if n > len(PERSONALITY_TRAITS):
         raise ValueError("n exceeds the number of available personality traits.")
-    return random.sample(PERSONALITY_TRAITS, n)
\ No newline at end of file
+    return (rng or random).sample(PERSONALITY_TRAITS, n)
\ No newline at end of file
@@ -3,9 +3,11 @@ from ast import List
 from enum import Enum
 from game.llm_agent import LLMAgent
 from game.parser import GameAction, PlayerResponse
-from game.roles.base import Role, RoleAlignment
+from game.roles.base import Role
 from game.personality import pick_random_personality
 from game.phase import Phase
+from game.prompt import BuiltPrompt, PromptBuilder
+from game.session import Session
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -22,21 +24,23 @@ class Player:
         self.name: str = name
         self.role: Role = role
         self.status: PlayerStatus = PlayerStatus.ALIVE
-        self.personality_trait1: str = pick_random_personality()
-        self.personality_trait2: str = pick_random_personality()
+        self.personality_trait1: str = pick_random_personality(game.rng)
+        self.personality_trait2: str = pick_random_personality(game.rng)
 
+        # The rules every player shares come first so the server can reuse their cached prefix across players
         self.system_prompt: str = (
-            f"You are {self.name}, a player in Town of Salem.\n"
+            "This is a game of Town of Salem.\n"
             "There are three phases.\n"
             "1. Day Phase: Players discuss their findings.\n"
             "2. Vote Phase: Players vote to lynch a player.\n"
             "3. Night Phase: Players perform their roles secretly.\n\n"
+            f"Roles in play:\n"
+            f"{game.roles_string}\n\n"
+            f"You are {self.name}, a player in Town of Salem.\n"
             f"You are a {self.role.name}.\n"
             "Nobody knows what role you are, if you expose your role, you may be targeted.\n"
             f"{self.role.get_alignment_prompt()}\n"
             f"{self.role.role_prompt}\n"
-            f"Roles in play:\n"
-            f"{game.roles_string}\n\n"
             f"You are emotional, {self.personality_trait1} and {self.personality_trait2}. "
             "Use your traits to decide what words you use and how you use them.\n\n"
         )
@@ -55,10 +59,10 @@ class Player:
         )
 
 
-        self.history: List[str] = []
+        # Start of the current day in the game's event log
+        self.day_cursor: int = 0
 
-        
-        self.llm_agent: LLMAgent = LLMAgent(self, system_prompt=self.system_prompt)
+        self.llm_agent: LLMAgent = LLMAgent(self, model_name=game.model_name, system_prompt=self.system_prompt, backend=game.backend)
 
     def __repr__(self) -> str:
         return f"<Player {self.name} ({self.role.name})>"
@@ -66,10 +70,10 @@ class Player:
     def on_game_start(self, game: 'Game') -> None:
         self._game = game
         self.setup_all_players_prompt()
-        self.day_history: List[str] = []
+        self.day_cursor = len(self._game.event_log)
 
     def on_day_start(self) -> None:
-        self.day_history: List[str] = []
+        self.day_cursor = len(self._game.event_log)
 
         # Check if role has a on_day_start method
         if hasattr(self.role, 'on_day_start'):
@@ -82,95 +86,135 @@ class Player:
             self.role.on_night_start(self._game)
 
     def setup_all_players_prompt(self) -> None:
-        """Set up a prompt with all players' names and roles."""
-        # print(f"{self.name} is setting up all players prompt.")
-        self.all_players_prompt: str = "Players in the game:\n"
-        self.all_players: dict[int, str] = {}
-        for player in self._game.players:
-            knows_role: bool = player == self
-
-            # If the player is dead, they know their own role
-            if player.status == PlayerStatus.DEAD:
-                knows_role = True
-
-            # If both players are Mafia, they know each other's roles
-            if player.role.alignment == RoleAlignment.MAFIA and self.role.alignment == RoleAlignment.MAFIA:
-                knows_role = True
-
-            # If player is a revealed mayor, all players know their role
-            from game.roles.mayor import Mayor
-            if isinstance(player.role, Mayor) and getattr(player.role, 'revealed', False):
-                knows_role = True
-            
-            self.all_players_prompt += f"{player.index} {player.name} {"Alive" if player.status == PlayerStatus.ALIVE else "Dead"} {player.role.name if knows_role else "Unknown role"}\n"
-        self.all_players_prompt += "\n"
+        """Set up a prompt with all players' names and roles, as this player sees them."""
+        self.all_players_prompt: str = self._game.roster.render(self)
+
+    @property
+    def session(self) -> Session | None:
+        """This player's conversation when the game runs in session mode."""
+        return self.llm_agent.session if self._game.sessions else None
+
+    def new_prompt(self) -> PromptBuilder:
+        """Start a prompt sized to this game's context budget, after the earlier turns of the session if any."""
+        session: Session | None = self.session
+        if session is None:
+            return PromptBuilder(self.system_prompt, self._game.max_context_tokens, self._game.response_tokens)
+
+        budget: int = self._game.max_context_tokens - self._game.response_tokens
+        if session and session.estimated_tokens > budget * self._game.session_compact_ratio:
+            # Compact by starting over, the next turn carries the current roster and day log again
+            session.reset()
+            self._game.metrics.increment("sessions_compacted")
+        return PromptBuilder(self.system_prompt, self._game.max_context_tokens, self._game.response_tokens, session.chars)
+
+    def finish_prompt(self, prompt: PromptBuilder) -> BuiltPrompt:
+        """Build the prompt and count what had to be cut to fit it."""
+        built: BuiltPrompt = prompt.build()
+        game = self._game
+        if game.sessions:
+            # A session only grows, start at the largest window rather than reloading on the way up
+            built.num_ctx = game.max_context_tokens
+        # Every call to a model uses the largest window any of its prompts needed so far, see Game.num_ctx
+        model: str = self.llm_agent.model_name
+        current: int = game.num_ctx.get(model, 0)
+        if built.num_ctx > current:
+            if current:
+                game.metrics.increment("num_ctx_switches")
+            game.num_ctx[model] = built.num_ctx
+        else:
+            built.num_ctx = current
+        if built.trimmed_lines:
+            self._game.metrics.increment("prompts_trimmed")
+            self._game.metrics.increment("prompt_trimmed_lines", built.trimmed_lines)
+            self._game.metrics.increment("prompt_trimmed_tokens", built.trimmed_tokens)
+        return built
+
+    def add_game_state(self, prompt: PromptBuilder) -> None:
+        """
+        The roster and the day log, shared by every prompt of the day. They go before the phase instructions:
+        the roster only changes on a death and the log only grows, so consecutive prompts share a long prefix.
+        A session past its first turn only gets the roster when it changed and the messages since the last turn.
+        """
+        self.setup_all_players_prompt()
+        session: Session | None = self.session
+        if session is not None:
+            session.begin_turn(len(self._game.event_log), self.all_players_prompt)
+            if session:
+                if self.all_players_prompt != session.roster:
+                    prompt.add(self.all_players_prompt)
+                prompt.add("Since your last turn:\n")
+                prompt.add_log(self._game.event_log.visible_to(self, session.cursor), "Nothing has happened.\n\n")
+                return
+
+        prompt.add(self.all_players_prompt)
+
+        # The oldest lines are cut if the prompt doesn't fit
+        prompt.add("Full day log:\n")
+        prompt.add_log(self.day_history, "Nothing has happened today.\n\n")
 
     async def chat(self) -> PlayerResponse:
         """Use the LLM agent to generate a chat response."""
         if not self.llm_agent:
             raise ValueError("LLM Agent is not initialized for this player.")
         
-        prompt = ""
+        prompt, day_actions = self.chat_prompt()
+        built: BuiltPrompt = self.finish_prompt(prompt)
+        response: PlayerResponse = await self.llm_agent.chat(built.text, Phase.DAY, day_actions, built.num_ctx, built.sections)
+        
+        return response
 
-        # Add day prompt
-        prompt += self.day_prompt
+    def chat_prompt(self) -> tuple[PromptBuilder, list[GameAction]]:
+        """The prompt asking this player to speak and the actions it offers."""
+        prompt: PromptBuilder = self.new_prompt()
+        self.add_game_state(prompt)
 
-        # Add players to the prompt
-        self.setup_all_players_prompt()
-        prompt += self.all_players_prompt
+        # Add day prompt
+        prompt.add(self.day_prompt)
 
-        prompt += f"\n{self.role.day_prompt}\n" if self._game.is_day() else f"{self.role.night_prompt}\n\n"
+        prompt.add(f"{self.role.day_prompt}\n" if self._game.is_day() else f"{self.role.night_prompt}\n\n")
 
         # Add actions available
-        prompt += "Available actions:\n"
-        actions: List[GameAction] = self._game.parser.get_phase_actions_for_role(self.role, self._game.phase)
-
-        for action in actions:
-            if action.phase == Phase.DAY and self._game.is_day():
-                prompt += f"- {action.name}, Usage: {action.tag}\n"
+        prompt.add("Available actions:\n")
+        actions: List[GameAction] = self._game.parser.get_phase_actions_for_role(self._game.phase, self.role)
 
-        # turn the history into a single string prompt
-        prompt += "\nFull day log:\n"
-        if self.day_history:
-            prompt += "\n".join(f"{msg}" for msg in self.day_history) + "\n\n"
-        else:
-            prompt += "Nothing has happened today.\n\n"
+        day_actions: List[GameAction] = [action for action in actions if action.phase == Phase.DAY and self._game.is_day()]
+        for action in day_actions:
+            prompt.add(f"- {action.name}, Usage: {action.tag}\n")
 
+        prompt.add(f"\nYour turn to speak, {self.name}:\n")
+        return prompt, day_actions
 
-        response: PlayerResponse = await self.llm_agent.chat(prompt)
-        
-        return response
+    def opening_context_size(self) -> int:
+        """Context window this player's next speech needs as the game stands, to load the model with at the start."""
+        if self._game.sessions:
+            return self._game.max_context_tokens
+        prompt, _ = self.chat_prompt()
+        return prompt.build().num_ctx
 
     async def vote(self) -> PlayerResponse:
         """Use the LLM agent to generate a vote action."""
         if not self.llm_agent:
             raise ValueError("LLM Agent is not initialized for this player.")
         
-        prompt = ""
-
-        prompt += "VOTE PHASE RULES:\n"
-        prompt += "- End your message with <VOTE>player name</VOTE>\n"
-        prompt += "- You may NOT vote for yourself.\n"
-        prompt += "- You may ONLY vote for living players.\n"
-        prompt += "- You may stay silent.\n"
-        prompt += "- Put your reasoning outside of your vote tag.\n"
-        prompt += "Examples:\n"
-        prompt += "I think Tom is suspicious. <VOTE>Tom</VOTE>\n"
-        prompt += "I have no idea who to vote for. <VOTE></VOTE>\n\n"
-
-        # Add players to the prompt
-        self.setup_all_players_prompt()
-        prompt += self.all_players_prompt
-
-        prompt += "\n\nFull day log:\n"
-        if self.day_history:
-            prompt += "\n".join(f"{msg}" for msg in self.day_history) + "\n\n"
-        else:
-            prompt += "Nothing has happened today.\n\n"
+        prompt: PromptBuilder = self.new_prompt()
+        self.add_game_state(prompt)
+
+        prompt.add(
+            "VOTE PHASE RULES:\n"
+            "- End your message with <VOTE>player name</VOTE>\n"
+            "- You may NOT vote for yourself.\n"
+            "- You may ONLY vote for living players.\n"
+            "- You may stay silent.\n"
+            "- Put your reasoning outside of your vote tag.\n"
+            "Examples:\n"
+            "I think Tom is suspicious. <VOTE>Tom</VOTE>\n"
+            "I have no idea who to vote for. <VOTE></VOTE>\n\n"
+        )
 
-        prompt += f"Your turn to vote, {self.name}:\n"
+        prompt.add(f"Your turn to vote, {self.name}:\n")
 
-        response: PlayerResponse = await self.llm_agent.chat(prompt)
+        built: BuiltPrompt = self.finish_prompt(prompt)
+        response: PlayerResponse = await self.llm_agent.chat(built.text, Phase.VOTE, self._game.parser.get_phase_actions(Phase.VOTE), built.num_ctx, built.sections)
         
         return response
 
@@ -179,49 +223,73 @@ class Player:
         if not self.llm_agent:
             raise ValueError("LLM Agent is not initialized for this player.")
         
-        prompt = "You are not allowed to speak during the night phase.\n"
-
-        prompt += "NIGHT PHASE RULES:\n"
-        prompt += "- You may perform your role's action.\n"
-        prompt += "- You may NOT vote.\n"
-        prompt += "- You may NOT speak.\n"
-        prompt += "- You may NOT target dead players.\n"
+        prompt: PromptBuilder = self.new_prompt()
+        self.add_game_state(prompt)
+
+        prompt.add(
+            "You are not allowed to speak during the night phase.\n"
+            "NIGHT PHASE RULES:\n"
+            "- You may perform your role's action.\n"
+            "- You may NOT vote.\n"
+            "- You may NOT speak.\n"
+            "- You may NOT target dead players.\n"
+        )
 
         # Add night prompt
-        prompt += self.role.night_prompt + "\n\n"
-
-        # Add players to the prompt
-        self.setup_all_players_prompt()
-        prompt += self.all_players_prompt
-
-        prompt += "\n\nFull day log:\n"
-        if self.day_history:
-            prompt += "\n".join(f"{msg}" for msg in self.day_history) + "\n\n"
-        else:
-            prompt += "Nothing has happened today.\n\n"
+        prompt.add(self.role.night_prompt + "\n\n")
 
         # Get all the player's available actions
-        prompt += "Available actions:\n"
+        prompt.add("Available actions:\n")
         actions = self.role.actions.copy() if hasattr(self.role, 'actions') else []
+        night_actions: List[GameAction] = [action for action in actions if action.phase == Phase.NIGHT]
         if actions and len(actions) > 0:
-            for action in actions:
-                if action.phase == Phase.NIGHT:
-                    prompt += f"- {action.name}, Usage: {action.tag}\n"
+            for action in night_actions:
+                prompt.add(f"- {action.name}, Usage: {action.tag}\n")
 
         else:
-            prompt += "No actions available.\n"
+            prompt.add("No actions available.\n")
             
 
-        prompt += f"Your turn to act, {self.name}:\n"
+        prompt.add(f"Your turn to act, {self.name}:\n")
 
-        response: PlayerResponse = await self.llm_agent.chat(prompt)
+        built: BuiltPrompt = self.finish_prompt(prompt)
+        response: PlayerResponse = await self.llm_agent.chat(built.text, Phase.NIGHT, night_actions, built.num_ctx, built.sections)
         
         return response
 
+    def get_state(self) -> dict:
+        """Snapshot of the player's state for checkpoints."""
+        return {
+            "index": self.index,
+            "name": self.name,
+            "role": self.role.name,
+            "status": self.status.name,
+            "day_cursor": self.day_cursor,
+            "role_state": self.role.get_state(),
+            # Empty unless the game runs in session mode
+            "session": self.llm_agent.session.get_state(),
+        }
+
+    def load_state(self, state: dict) -> None:
+        """Restore a snapshot taken by get_state."""
+        self.status = PlayerStatus[state["status"]]
+        self.day_cursor = state["day_cursor"]
+        self.role.load_state(state["role_state"], self._game)
+        self.llm_agent.session.load_state(state["session"])
+
+    @property
+    def history(self) -> list[str]:
+        """Every message this player has seen."""
+        return self._game.event_log.visible_to(self)
+
+    @property
+    def day_history(self) -> list[str]:
+        """Messages this player has seen since the current day started."""
+        return self._game.event_log.visible_to(self, self.day_cursor)
+
     def add_to_history(self, message: str) -> None:
-        """Add a message to the player's history."""
-        self.history.append(message)
-        self.day_history.append(message)
+        """Tell this player a message nobody else sees."""
+        self._game.event_log.tell(self, message)
 
     def is_alive(self) -> bool:
         """Check if the player is alive."""
@@ -0,0 +1,151 @@
+# prompt.py
+# Prompt assembly within a token budget. Sections are measured with a cheap token estimate, the oldest day log
+# lines are cut when the prompt would not fit, and each prompt is matched with the smallest context window that
+# holds it. The game only ever moves its calls up to a larger window, see Player.finish_prompt.
+import math
+
+# Context window sizes handed to Ollama as num_ctx, smaller windows are faster on CPU inference
+CONTEXT_BUCKETS: tuple[int, ...] = (2048, 4096, 8192, 16384)
+# Rough average for English text with the tokenizers of the models we use, errs on the side of more tokens
+CHARS_PER_TOKEN: float = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def common_prefix_length(a: str, b: str, resolution: int = 1) -> int:
+    """
+    Length of the longest common prefix. Compares blocks of doubling size, then bisects the block that differs,
+    only ever copying the part not known to match yet, so the work stays linear and runs in C.
+    With a coarser resolution the bisection stops early and the result may be up to resolution - 1 short.
+    """
+    length: int = min(len(a), len(b))
+    # a[:low] == b[:low] throughout
+    low: int = 0
+    size: int = 512
+    while low < length:
+        end: int = min(low + size, length)
+        if a.startswith(b[low:end], low):
+            low = end
+            size *= 2
+            continue
+        # The first difference is in [low, high)
+        high: int = end
+        while high - low > resolution:
+            middle: int = (low + high) // 2
+            if a.startswith(b[low:middle], low):
+                low = middle
+            else:
+                high = middle
+        return low
+    return length
+
+
+def common_prefix_of_parts(a: list[str], b: list[str], resolution: int = 1) -> int:
+    """
+    Common prefix length of two texts given as lists of parts, e.g. messages or prompt sections. Parts that are
+    the same string, like a cached roster, are skipped without comparing and the prefix ends in the first part
+    that differs, which is a little short when the parts were cut differently.
+    """
+    length: int = 0
+    for first, second in zip(a, b):
+        if first is second or first == second:
+            length += len(first)
+            continue
+        if first.startswith(second):
+            # Usually a log that grew since
+            return length + len(second)
+        return length + common_prefix_length(first, second, resolution)
+    return length
+
+
+def pick_context_size(tokens: int, max_context: int) -> int:
+    """Smallest bucket that holds the given number of tokens, never above max_context."""
+    for size in CONTEXT_BUCKETS:
+        if size >= max_context:
+            break
+        if size >= tokens:
+            return size
+    return max_context
+
+
+class BuiltPrompt:
+    def __init__(self, text: str, num_ctx: int, estimated_tokens: int, trimmed_lines: int = 0, trimmed_tokens: int = 0,
+                 sections: list[str] | None = None):
+        self.text: str = text
+        # The pieces text was joined from
+        self.sections: list[str] = sections if sections is not None else [text]
+        self.num_ctx: int = num_ctx
+        # Estimate for the system prompt plus this prompt plus the reserved response
+        self.estimated_tokens: int = estimated_tokens
+        self.trimmed_lines: int = trimmed_lines
+        self.trimmed_tokens: int = trimmed_tokens
+
+
+class PromptBuilder:
+    """
+    Collects the sections of a user prompt in order. One of them may be a log whose oldest lines
+    are dropped, with a note saying how many, when the whole prompt would overflow max_context.
+    """
+
+    def __init__(self, system_prompt: str, max_context: int = 8192, response_tokens: int = 512, prior_chars: int = 0):
+        self.system_prompt: str = system_prompt
+        # Length of the earlier turns sent along with this prompt, in session mode
+        self.prior_chars: int = prior_chars
+        self.max_context: int = max_context
+        # Room left for the model's answer
+        self.response_tokens: int = response_tokens
+        self.sections: list[str] = []
+        self.log_lines: list[str] = []
+        self.log_index: int | None = None
+        self.log_empty: str = ""
+
+    def add(self, text: str) -> None:
+        self.sections.append(text)
+
+    def add_log(self, lines: list[str], empty: str) -> None:
+        """The log, rendered one message per line followed by a blank line, or as empty when there is none."""
+        if self.log_index is not None:
+            raise ValueError("A prompt can only have one log section.")
+        self.log_index = len(self.sections)
+        self.log_lines = lines
+        self.log_empty = empty
+        # The log and the blank line after it, apart so the previous prompt's log stays a prefix of this one's
+        self.sections.append("")
+        self.sections.append("")
+
+    def render_log(self, lines: list[str], omitted: int) -> str:
+        if omitted:
+            lines = [f"({omitted} earlier messages were cut)"] + lines
+        return "\n".join(lines) + "\n" if lines else self.log_empty
+
+    def build(self) -> BuiltPrompt:
+        fixed_chars: int = len(self.system_prompt) + self.prior_chars + sum(len(section) for section in self.sections)
+        budget_chars: int = int((self.max_context - self.response_tokens) * CHARS_PER_TOKEN) - fixed_chars
+
+        lines: list[str] = self.log_lines
+        omitted: int = 0
+        log_text: str = self.render_log(lines, 0)
+        # A blank line closes the log, the empty text brings its own
+        blank: str = "\n" if lines else ""
+        if len(log_text) + len(blank) > budget_chars and lines:
+            # Keep the newest lines that fit next to the cut note
+            used: int = len(self.render_log([], len(lines))) + 2
+            keep: int = 0
+            for line in reversed(lines):
+                if used + len(line) + 1 > budget_chars:
+                    break
+                used += len(line) + 1
+                keep += 1
+            omitted = len(lines) - keep
+            log_text = self.render_log(lines[omitted:], omitted)
+
+        if self.log_index is not None:
+            self.sections[self.log_index] = log_text
+            self.sections[self.log_index + 1] = blank
+        text: str = "".join(self.sections)
+
+        tokens: int = math.ceil((fixed_chars + len(log_text) + len(blank)) / CHARS_PER_TOKEN) + self.response_tokens
+        trimmed_tokens: int = estimate_tokens("\n".join(lines[:omitted])) if omitted else 0
+        return BuiltPrompt(text, pick_context_size(tokens, self.max_context), tokens, omitted, trimmed_tokens, list(self.sections))
@@ -1 +1,28 @@
-# Empty
\ No newline at end of file
+# Role registry, used to build role lists from names (tournament configs, checkpoints)
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.roles.base import Role
+
+ROLE_NAMES: list[str] = ["Doctor", "Godfather", "Innocent", "Mafioso", "Mayor", "Sheriff"]
+
+def create_role(name: str) -> 'Role':
+    """Create a new role instance from its name."""
+    # Imported here, the role modules import the engine
+    from game.roles.doctor import Doctor
+    from game.roles.godfather import Godfather
+    from game.roles.innocent import Innocent
+    from game.roles.mafioso import Mafioso
+    from game.roles.mayor import Mayor
+    from game.roles.sheriff import Sheriff
+
+    roles: dict[str, type] = {
+        "Doctor": Doctor,
+        "Godfather": Godfather,
+        "Innocent": Innocent,
+        "Mafioso": Mafioso,
+        "Mayor": Mayor,
+        "Sheriff": Sheriff,
+    }
+    if name not in roles:
+        raise ValueError(f"Unknown role: {name}. Known roles: {', '.join(ROLE_NAMES)}.")
+    return roles[name]()
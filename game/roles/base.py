@@ -7,6 +7,7 @@ if TYPE_CHECKING:
     from game.player import Player
     from game.roles.doctor import Doctor
     from game.parser import GameAction
+    from game.generation import GenerationProfile
 
 # Base Role class and interface for actions
 
@@ -52,6 +53,8 @@ class Role(ABC):
 
         self.player: 'Player' = None
         self.actions: list['GameAction'] = []
+        # Action name -> generation limits for this role, overriding the game's (see game/generation.py)
+        self.generation_profiles: dict[str, 'GenerationProfile'] = {}
 
         self._game: 'Game' = None
 
@@ -74,7 +77,15 @@ class Role(ABC):
     def add_action(self, action: 'GameAction') -> None:
         """Add an action to the role."""
         self.actions.append(action)
-        self._game.parser.regiser_role_action(action, self)
+        self._game.parser.register_role_action(action, self)
+
+    def get_state(self) -> dict:
+        """Role-private state to keep in checkpoints. Override in roles that have any."""
+        return {}
+
+    def load_state(self, state: dict, game: 'Game') -> None:
+        """Restore the state returned by get_state."""
+        pass
 
     def attack(self, player: 'Player', target: 'Player') -> None:
         """Perform an attack action on the target player."""
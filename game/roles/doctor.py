@@ -1,6 +1,7 @@
 # Doctor role
 from game.player import Player
 from .base import AttackingPower, DefensivePower, Role, RoleAlignment
+from game.history import HistoryLevel
 from game.parser import GameAction, PlayerResponse
 from game.phase import Phase
 
@@ -37,11 +38,11 @@ class Doctor(Role):
         target = game.name_to_player(content)
         if not target:
             player.add_to_history("Invalid heal target.")
-            game.add_to_history(f"{player.name} attempted to heal an invalid target: {content}.")
+            game.add_to_history(f"{player.name} attempted to heal an invalid target: {content}.", HistoryLevel.DEBUG)
             return
         
         self.last_healed = target
-        game.add_to_history(f"{player.name} is healing {target.name}.")
+        game.add_to_history(f"{player.name} is healing {target.name}.", HistoryLevel.DEBUG)
         player.add_to_history(f"Healed {target.name} at night.")
 
     def setup_actions(self):
@@ -58,6 +59,13 @@ class Doctor(Role):
         """
         self.last_healed = None
 
+    def get_state(self) -> dict:
+        return {"last_healed": self.last_healed.index if self.last_healed else None}
+
+    def load_state(self, state: dict, game: 'Game') -> None:
+        index = state.get("last_healed")
+        self.last_healed = game.players[index - 1] if index else None
+
     def is_protecting(self, player: Player) -> bool:
         """
         Check if the Doctor is protecting a specific player.
@@ -1,5 +1,6 @@
 # Godfather role
 from .base import AttackingPower, DefensivePower, Role, RoleAlignment
+from game.history import HistoryLevel
 from game.parser import GameAction, PlayerResponse
 from game.player import Player
 from game.engine import Game
@@ -33,7 +34,7 @@ class Godfather(Role):
         target = game.name_to_player(content)
         if not target:
             player.add_to_history("Invalid kill target.")
-            game.add_to_history(f"{player.name} attempted to kill an invalid target: {content}.")
+            game.add_to_history(f"{player.name} attempted to kill an invalid target: {content}.", HistoryLevel.DEBUG)
             return
         
         attacker: Player = player
@@ -44,7 +45,7 @@ class Godfather(Role):
                 attacker = _player
                 break
 
-        game.add_to_history(f"Godfather {player.name} is attacking {target.name}.")
+        game.add_to_history(f"Godfather {player.name} is attacking {target.name}.", HistoryLevel.DEBUG)
         # Perform the attack
         game.player_attack(attacker, target)
 
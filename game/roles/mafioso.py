@@ -1,6 +1,7 @@
 # Mafioso role (formerly Mafia)
 from game.player import Player
 from .base import AttackingPower, DefensivePower, Role, RoleAlignment
+from game.history import HistoryLevel
 from game.parser import GameAction, PlayerResponse
 from game.engine import Game, Phase
 
@@ -40,7 +41,7 @@ class Mafioso(Role):
         target = game.name_to_player(content)
         if not target:
             player.add_to_history("Invalid kill target.")
-            game.add_to_history(f"{player.name} attempted to kill an invalid target: {content}.")
+            game.add_to_history(f"{player.name} attempted to kill an invalid target: {content}.", HistoryLevel.DEBUG)
             return
         
         attacker: Player = player
@@ -29,6 +29,12 @@ class Mayor(Role):
 
         self.revealed = False
 
+    def get_state(self) -> dict:
+        return {"revealed": self.revealed}
+
+    def load_state(self, state: dict, game: Game) -> None:
+        self.revealed = state.get("revealed", False)
+
     def day_action(self, game: Game, player: Player, llm_agent: LLMAgent = None) -> str:
         # Mayor may choose to reveal or not
         if llm_agent:
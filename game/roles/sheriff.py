@@ -1,4 +1,5 @@
 # Sheriff role
+from game.history import HistoryLevel
 from game.parser import GameAction, PlayerResponse
 from game.phase import Phase
 from .base import AttackingPower, DefensivePower, Role, RoleAlignment
@@ -32,7 +33,7 @@ class Sheriff(Role):
         target = game.name_to_player(content)
         if not target:
             player.add_to_history("Invalid interrogation target.")
-            game.add_to_history(f"{player.name} attempted to interrogate an invalid target: {content}.")
+            game.add_to_history(f"{player.name} attempted to interrogate an invalid target: {content}.", HistoryLevel.DEBUG)
             return
         
         # Check if the target is suspicious (Mafia)
@@ -40,10 +41,10 @@ class Sheriff(Role):
         
         if is_suspicious:
             player.add_to_history(f"{target.name} is suspicious (Mafia).")
-            game.add_to_history(f"{player.name} interrogated {target.name} and found them suspicious.")
+            game.add_to_history(f"{player.name} interrogated {target.name} and found them suspicious.", HistoryLevel.DEBUG)
         else:
             player.add_to_history(f"{target.name} is not suspicious (Innocent or Godfather).")
-            game.add_to_history(f"{player.name} interrogated {target.name} and found them not suspicious.")
+            game.add_to_history(f"{player.name} interrogated {target.name} and found them not suspicious.", HistoryLevel.DEBUG)
 
     def setup_actions(self):
         """
@@ -0,0 +1,76 @@
+# roster.py
+# Renders the "Players in the game" block of the prompts. Every non-Mafia player sees the same roster and
+# so does every Mafia member, so the lines are rendered once per view and reused until a death changes
+# what players can see.
+from game.roles.base import RoleAlignment
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from game.engine import Game
+    from game.player import Player
+
+TOWN_VIEW = "town"
+MAFIA_VIEW = "mafia"
+
+
+class Roster:
+    def __init__(self, game: 'Game'):
+        self._game: 'Game' = game
+        # Bumped on every invalidation, handy to tell whether a prompt was built from a stale roster
+        self.version: int = 0
+        # View -> one line per player, in seat order
+        self._views: dict[str, list[str]] = {}
+        # View (when the reader's own line is already in it) or player index -> rendered roster
+        self._rendered: dict[str | int, str] = {}
+        # Player index -> the roster that player sees, shared strings included
+        self._by_player: dict[int, str] = {}
+
+    def invalidate(self) -> None:
+        """Drop the rendered rosters. Call after anything that changes what players can see, like a death."""
+        self.version += 1
+        self._views.clear()
+        self._rendered.clear()
+        self._by_player.clear()
+
+    @staticmethod
+    def line(player: 'Player', knows_role: bool) -> str:
+        status: str = "Alive" if player.is_alive() else "Dead"
+        role: str = player.role.name if knows_role else "Unknown role"
+        return f"{player.index} {player.name} {status} {role}\n"
+
+    @staticmethod
+    def view_of(player: 'Player') -> str:
+        return MAFIA_VIEW if player.role.alignment == RoleAlignment.MAFIA else TOWN_VIEW
+
+    def view_lines(self, view: str) -> list[str]:
+        lines: list[str] | None = self._views.get(view)
+        if lines is None:
+            lines = []
+            for player in self._game.players:
+                # Dead players and revealed mayors are known to all, Mafia members know each other.
+                # No action reveals a Mayor yet, a role that sets revealed must invalidate the roster.
+                knows_role: bool = (not player.is_alive() or getattr(player.role, "revealed", False)
+                                    or (view == MAFIA_VIEW and player.role.alignment == RoleAlignment.MAFIA))
+                lines.append(self.line(player, knows_role))
+            self._views[view] = lines
+        return lines
+
+    def render(self, player: 'Player') -> str:
+        """The roster as the given player sees it, their own role always shown."""
+        rendered: str | None = self._by_player.get(player.index)
+        if rendered is not None:
+            return rendered
+
+        view: str = self.view_of(player)
+        lines: list[str] = self.view_lines(view)
+        position: int = player.index - 1
+        own_line: str = self.line(player, True)
+
+        # Players whose role the view already shows share one string
+        key: str | int = view if lines[position] == own_line else player.index
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = "Players in the game:\n" + "".join(lines[:position]) + own_line + "".join(lines[position + 1:]) + "\n"
+            self._rendered[key] = rendered
+        self._by_player[player.index] = rendered
+        return rendered
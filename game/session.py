@@ -0,0 +1,54 @@
+# session.py
+# Multi-turn conversations between a player and the model. Instead of a fresh prompt with the whole roster and
+# day log every call, a session sends only what happened since the player's last turn, so the server keeps the
+# earlier turns in its prompt cache and only evaluates the new tokens.
+from game.prompt import CHARS_PER_TOKEN
+
+
+class Session:
+    def __init__(self):
+        # User and assistant turns, the system prompt is added by LLMAgent
+        self.messages: list[dict] = []
+        # Characters in messages, to tell when the session nears the context budget
+        self.chars: int = 0
+        # Event log position the turns so far have covered
+        self.cursor: int = 0
+        # Roster sent last, resent when it changes
+        self.roster: str = ""
+        # Cursor and roster of the turn being prompted, kept once the model answers
+        self.pending_cursor: int = 0
+        self.pending_roster: str = ""
+
+    def __bool__(self) -> bool:
+        return bool(self.messages)
+
+    @property
+    def estimated_tokens(self) -> int:
+        return int(self.chars / CHARS_PER_TOKEN)
+
+    def reset(self) -> None:
+        """Forget every turn, the next one starts over from the full game state."""
+        self.messages = []
+        self.chars = 0
+        self.cursor = 0
+        self.roster = ""
+
+    def get_state(self) -> dict:
+        return {"messages": self.messages, "chars": self.chars, "cursor": self.cursor, "roster": self.roster}
+
+    def load_state(self, state: dict) -> None:
+        self.messages = state["messages"]
+        self.chars = state["chars"]
+        self.cursor = state["cursor"]
+        self.roster = state["roster"]
+
+    def begin_turn(self, cursor: int, roster: str) -> None:
+        self.pending_cursor = cursor
+        self.pending_roster = roster
+
+    def end_turn(self, prompt: str, response: str) -> None:
+        self.messages.append({"role": "user", "content": prompt})
+        self.messages.append({"role": "assistant", "content": response})
+        self.chars += len(prompt) + len(response)
+        self.cursor = self.pending_cursor
+        self.roster = self.pending_roster
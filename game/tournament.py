@@ -0,0 +1,244 @@
+# tournament.py
+# Batch runner: plays many games concurrently within each event loop and spreads them across a process pool.
+#
+# Example config (JSON):
+# {
+#     "roles": ["Godfather", "Mafioso", "Sheriff", "Doctor", "Innocent", "Innocent", "Innocent"],
+#     "player_count": 7,
+#     "first_day_speak_rounds": 1,
+#     "day_speak_rounds": 3,
+#     "model": "gemma3:4b",
+#     "backend": "ollama",
+#     "seed_start": 0,
+#     "games": 100,
+#     "games_per_loop": 4,
+#     "processes": 2
+# }
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game.backends import BalancedBackend, LLMBackend, MockBackend, OllamaBackend
+from game.debug_capture import debug_capture
+from game.engine import Game
+from game.history import HistorySink, TextHistorySink
+from game.metrics import MetricsRecorder
+from game.roles import create_role
+from game.roles.base import RoleAlignment
+
+
+class TournamentConfig:
+    def __init__(self, roles: list[str], player_count: int | None = None, first_day_speak_rounds: int = 1,
+                 day_speak_rounds: int = 3, model: str = "gemma3:4b", backend: str = "ollama",
+                 host: str | None = None, seed_start: int = 0, games: int = 10, games_per_loop: int = 4,
+                 processes: int = 1, max_concurrent_calls: int = 8, history_dir: str | None = None, stream: bool = False,
+                 sessions: bool = False, keep_alive: str | float | None = "30m", call_timeout: float | None = None,
+                 hosts: list[str] | None = None, max_in_flight_per_host: int = 4, hedge: bool = False):
+        self.roles: list[str] = roles
+        self.player_count: int = player_count if player_count is not None else len(roles)
+        self.first_day_speak_rounds: int = first_day_speak_rounds
+        self.day_speak_rounds: int = day_speak_rounds
+        self.model: str = model
+        self.backend: str = backend  # "ollama" or "mock"
+        self.host: str | None = host
+        self.seed_start: int = seed_start
+        self.games: int = games
+        self.games_per_loop: int = games_per_loop
+        self.processes: int = processes
+        self.max_concurrent_calls: int = max_concurrent_calls
+        # Write one history file per game into this directory, no history is written when unset
+        self.history_dir: str | None = history_dir
+        # Stream vote and night calls and stop at the closing action tag (ollama backend), only calls
+        # without a stop sequence are streamed
+        self.stream: bool = stream
+        # Send each player only the events since their last turn, see game/session.py
+        self.sessions: bool = sessions
+        # How long the server keeps the model loaded after each call, -1 pins it for the whole tournament
+        self.keep_alive: str | float | None = keep_alive
+        # Deadline in seconds for every LLM call, the game's per-phase defaults when unset
+        self.call_timeout: float | None = call_timeout
+        # Ollama servers to balance the calls over instead of host, see game/backends/balancer.py.
+        # The games of a loop share one balancer, so the per-host cap holds per process.
+        self.hosts: list[str] | None = hosts
+        self.max_in_flight_per_host: int = max_in_flight_per_host
+        # Send calls slower than the 95th percentile to a second host as well
+        self.hedge: bool = hedge
+
+    @classmethod
+    def from_file(cls, path: str) -> 'TournamentConfig':
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @property
+    def seeds(self) -> list[int]:
+        return list(range(self.seed_start, self.seed_start + self.games))
+
+
+class TournamentStats:
+    """Aggregate of game results, updated as results stream in."""
+
+    def __init__(self):
+        self.games: int = 0
+        self.errors: int = 0
+        self.wins: dict[str, int] = {}
+        self.total_days: int = 0
+        self.min_days: int | None = None
+        self.max_days: int = 0
+        self.llm_calls: int = 0
+        self.preload_seconds: list[float] = []
+        # Role name -> [players with the role, players alive at the end]
+        self.role_survival: dict[str, list[int]] = {}
+
+    def add(self, result: dict) -> None:
+        if result.get("error"):
+            self.errors += 1
+            return
+
+        self.games += 1
+        self.wins[result["winner"]] = self.wins.get(result["winner"], 0) + 1
+        self.total_days += result["days"]
+        self.min_days = result["days"] if self.min_days is None else min(self.min_days, result["days"])
+        self.max_days = max(self.max_days, result["days"])
+        self.llm_calls += result["llm_calls"]
+        self.preload_seconds.append(result["preload_seconds"])
+        for role, (count, survived) in result["roles"].items():
+            totals = self.role_survival.setdefault(role, [0, 0])
+            totals[0] += count
+            totals[1] += survived
+
+    def report(self) -> dict:
+        games: int = max(1, self.games)
+        return {
+            "games": self.games,
+            "errors": self.errors,
+            "win_rates": {alignment: wins / games for alignment, wins in sorted(self.wins.items())},
+            "days": {"mean": self.total_days / games, "min": self.min_days or 0, "max": self.max_days},
+            "llm_calls_per_game": self.llm_calls / games,
+            # Time each game start spent loading models, the first one usually pays the actual load
+            "preload_seconds": {
+                "mean": sum(self.preload_seconds) / games,
+                "max": max(self.preload_seconds, default=0.0),
+            },
+            "role_survival": {role: survived / count for role, (count, survived) in sorted(self.role_survival.items())},
+        }
+
+
+def create_backend(config: TournamentConfig, seed: int) -> LLMBackend:
+    if config.backend == "mock":
+        return MockBackend(seed=seed)
+    return OllamaBackend(host=config.host, stream=config.stream)
+
+
+def create_balancer(config: TournamentConfig) -> BalancedBackend | None:
+    if config.backend == "mock" or not config.hosts:
+        return None
+    return BalancedBackend([OllamaBackend(host=host, stream=config.stream) for host in config.hosts],
+                           max_in_flight=config.max_in_flight_per_host, hedge=config.hedge)
+
+
+async def play_game(config: TournamentConfig, seed: int, backend: LLMBackend | None = None) -> dict:
+    """Play one game and summarize its outcome."""
+    history_sinks: list[HistorySink] = []
+    if config.history_dir:
+        history_sinks.append(TextHistorySink(os.path.join(config.history_dir, f"game_{seed}.txt")))
+
+    game: Game = Game(
+        player_count=config.player_count,
+        roles=[create_role(name) for name in config.roles],
+        history_sinks=history_sinks,
+        backend=backend if backend is not None else create_backend(config, seed),
+        metrics=MetricsRecorder(),
+        seed=seed,
+        model_name=config.model,
+    )
+    game.first_day_speak_rounds = config.first_day_speak_rounds
+    game.day_speak_rounds = config.day_speak_rounds
+    game.max_concurrent_calls = config.max_concurrent_calls
+    game.sessions = config.sessions
+    game.keep_alive = config.keep_alive
+    if config.call_timeout is not None:
+        game.call_timeouts = {phase: config.call_timeout for phase in game.call_timeouts}
+
+    try:
+        await game.start()
+    except Exception as e:
+        return {"seed": seed, "error": f"{type(e).__name__}: {e}"}
+
+    roles: dict[str, list[int]] = {}
+    for player in game.players:
+        totals = roles.setdefault(player.role.name, [0, 0])
+        totals[0] += 1
+        totals[1] += 1 if player.is_alive() else 0
+
+    return {
+        "seed": seed,
+        "winner": game.winner.value[1],
+        "days": game.day_number,
+        "llm_calls": len(game.metrics.records),
+        "preload_seconds": sum((sum(seconds) for seconds in game.metrics.preloads.values()), 0.0),
+        "roles": roles,
+    }
+
+
+async def play_games(config: TournamentConfig, seeds: list[int]) -> list[dict]:
+    """Play games concurrently on the current event loop, at most games_per_loop at a time."""
+    semaphore = asyncio.Semaphore(max(1, config.games_per_loop))
+    balancer: BalancedBackend | None = create_balancer(config)
+
+    async def run(seed: int) -> dict:
+        async with semaphore:
+            return await play_game(config, seed, balancer)
+
+    return await asyncio.gather(*(run(seed) for seed in seeds))
+
+
+def run_chunk(config_dict: dict, seeds: list[int]) -> list[dict]:
+    """Process pool entry point, plays a chunk of games on a fresh event loop."""
+    debug_capture.configure(enabled=False)
+    return asyncio.run(play_games(TournamentConfig(**config_dict), seeds))
+
+
+def run_tournament(config: TournamentConfig, verbose: bool = True) -> TournamentStats:
+    """Play every configured game and aggregate the results as they come in."""
+    if config.history_dir:
+        os.makedirs(config.history_dir, exist_ok=True)
+
+    seeds: list[int] = config.seeds
+    # Small chunks keep the processes busy and the results streaming
+    chunk_size: int = max(1, config.games_per_loop)
+    chunks: list[list[int]] = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+
+    stats: TournamentStats = TournamentStats()
+    started: float = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, config.processes)) as pool:
+        futures = [pool.submit(run_chunk, config.to_dict(), chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                stats.add(result)
+                if verbose:
+                    outcome = result.get("error") or f"{result['winner']} wins after {result['days']} days"
+                    print(f"[{stats.games + stats.errors}/{len(seeds)}] seed {result['seed']}: {outcome}")
+
+    if verbose:
+        print(f"Played {len(seeds)} games in {time.perf_counter() - started:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a tournament of games.")
+    parser.add_argument("config", help="Path to a tournament config JSON file")
+    parser.add_argument("--output", help="Write the aggregate report as JSON")
+    args = parser.parse_args()
+
+    report: dict = run_tournament(TournamentConfig.from_file(args.config)).report()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -6,12 +6,38 @@ from game.roles.mafioso import Mafioso
 from game.roles.innocent import Innocent
 from game.roles.sheriff import Sheriff
 from game.roles.doctor import Doctor
+from game.backends import BalancedBackend, OllamaBackend, RecordingBackend, ReplayBackend
+from game.checkpoint import load_checkpoint
+from game.history import StdoutHistorySink, TextHistorySink
+from game.tournament import TournamentConfig, run_tournament
+import argparse
+import json
 import os
 import glob
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Town of Salem simulation.")
+    parser.add_argument("--tournament", metavar="CONFIG", help="Run a batch of games from a tournament config JSON file")
+    parser.add_argument("--checkpoint", default="checkpoint.json.gz", help="Where to save the game state after every phase")
+    parser.add_argument("--resume", action="store_true", help="Continue the game saved in the checkpoint")
+    parser.add_argument("--record", metavar="PATH", help="Record every LLM response of the game to this file")
+    parser.add_argument("--replay", metavar="PATH", help="Re-run a recorded game without any LLM calls")
+    parser.add_argument("--stream", action="store_true", help="Stream vote and night responses and stop once the action tag closes. Only "
+                             "affects calls without a stop sequence, the default profiles already stop single actions")
+    parser.add_argument("--pin-model", action="store_true", help="Keep the model loaded after the game instead of 30 minutes")
+    parser.add_argument("--host", action="append", dest="hosts", metavar="URL",
+                        help="Ollama server to use, repeat it to balance the calls over several servers")
+    parser.add_argument("--hedge", action="store_true", help="Send calls slower than usual to a second server as well")
+    parser.add_argument("--sessions", action="store_true", help="Keep a conversation per player and only send what is new each turn")
+    args = parser.parse_args()
+
+    if args.tournament:
+        stats = run_tournament(TournamentConfig.from_file(args.tournament))
+        print(json.dumps(stats.report(), indent=2))
+        raise SystemExit(0)
+
     # Delete the contents of prompts and response folders
-    for folder in ["prompts", "response"]:
+    for folder in ["prompts", "response"] if not args.resume else []:
         for file in glob.glob(os.path.join(folder, "*.txt")):
             try:
                 os.remove(file)
@@ -38,13 +64,42 @@ if __name__ == "__main__":
         Doctor()        # 15 Innocent townsperson
     ]
     
-    # Create a new game instance
-    game = Game(player_count=player_count, roles=roles)
+    # Create a new game instance, or restore the saved one
+    if args.hosts and len(args.hosts) > 1:
+        ollama = BalancedBackend([OllamaBackend(host=host, stream=args.stream) for host in args.hosts], hedge=args.hedge)
+    else:
+        ollama = OllamaBackend(host=args.hosts[0] if args.hosts else None, stream=args.stream)
+    if args.replay:
+        game = ReplayBackend(args.replay).create_game()
+    elif args.resume:
+        game = load_checkpoint(args.checkpoint, backend=ollama,
+                               history_sinks=[StdoutHistorySink(), TextHistorySink("game_history.txt", append=True)])
+    else:
+        backend = RecordingBackend(ollama, args.record) if args.record else ollama
+        game = Game(player_count=player_count, roles=roles, backend=backend)
+    if not args.replay:
+        game.checkpoint_path = args.checkpoint
+        game.sessions = args.sessions
+        if isinstance(ollama, BalancedBackend):
+            # Enough calls in flight to keep every server busy
+            game.max_concurrent_calls = max(game.max_concurrent_calls, sum(host.max_in_flight for host in ollama.hosts))
+        if args.pin_model:
+            game.keep_alive = -1
     
     # Start the game
     import asyncio
 
     try:
-        asyncio.run(game.start())
+        asyncio.run(game.start(resume=args.resume))
     except Exception as e:
         print(f"An error occurred while starting the game: {e}")
+    finally:
+        if args.replay:
+            divergences = game.backend.divergences
+            print(f"Replay finished with {len(divergences)} divergent prompts.")
+            for divergence in divergences[:20]:
+                print(f"- {divergence['player']} call {divergence['sequence']} ({divergence['phase']}): {divergence['reason']}")
+
+        # Export the LLM call metrics
+        game.metrics.write_json("metrics.json")
+        game.metrics.write_prometheus("metrics.prom")